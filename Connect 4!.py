@@ -1,35 +1,65 @@
 # Connect 4! Made by August Vitzthum
+import os
 import intrographics
+import board
+import search
+import book
+import record
 
 window = intrographics.window(850, 850)
-background = window.image(0, 0, "Connect 4! Grid.gif")
+window.sprites("Sprites.png")
+background = window.image(0, 0, "Connect 4! Grid")
 
 # Nonlocal variables
-tile_count, location = 0, 745
+location = 745
 turn = "red"
+game = board.board()
+
+# Also rescan the whole board after every move to double-check wins
+verify = False
+
+# Set to "red" or "blue" to play against the computer
+computer = None
+opponent = None  # Made the first time the computer moves
+
+# Every finished game is added to this file (None turns recording off)
+records = "Game Records.c4"
+
+# Milliseconds for a dropped tile to fall one row. Tiles speed up as they
+# fall, so longer drops take less than this per row.
+fall_time = 150
 
 # Creating red and blue arrows
 def make_red():
     global red_arrow
-    red_arrow = window.image(385, 23, "Red Arrow.gif")
+    red_arrow = window.image(385, 23, "Red Arrow")
     red_arrow.group("arrow")
 
 def make_blue():
     global blue_arrow
-    blue_arrow = window.image(385, 23, "Blue Arrow.gif")
+    blue_arrow = window.image(385, 23, "Blue Arrow")
     blue_arrow.group("arrow")
 
+# Let a tile fall from the arrow down to its row
+def drop_tile(tile, location):
+    rows = (location - tile.y) / 120
+    window.animate(tile, tile.x, location, fall_time * rows ** 0.5, lambda along: along * along)
+
 def fill_red(location):
-    red_tile = window.image(red_arrow.x, location, "Red Tile.gif")
+    red_tile = window.image(red_arrow.x, red_arrow.y, "Red Tile")
     red_tile.group("tile")
     red_tile.group("red")
     red_tile.group("removable")
+    drop_tile(red_tile, location)
+    game.drop("red", board.column_of(red_tile.x))
 
 def fill_blue(location):
-    blue_tile = window.image(blue_arrow.x, location, "Blue Tile.gif")
+    blue_tile = window.image(blue_arrow.x, blue_arrow.y, "Blue Tile")
     blue_tile.group("tile")
     blue_tile.group("blue")
     blue_tile.group("removable")
+    drop_tile(blue_tile, location)
+    game.drop("blue", board.column_of(blue_tile.x))
 
 def remove_arrow():
     for arrow in window.all("arrow"):
@@ -37,144 +67,105 @@ def remove_arrow():
         arrow.ungroup("arrow")
 
 def check(color):
-    global south_count, east_count, south_east_count, north_east_count
-    south_count, east_count, south_east_count, north_east_count = 0, 0, 0, 0
-
-    for tile in window.all(color):
-        for other_tile in window.all(color):
-
-            if tile.x == other_tile.x and tile.y == other_tile.y - 120:
-
-                for other_tile in window.all(color):
-
-                    if tile.x == other_tile.x and tile.y == other_tile.y - 240:
-
-                        for other_tile in window.all(color):
-
-                            if tile.x == other_tile.x and tile.y == other_tile.y - 360:
-
-                                south_count = 3
-
-    for tile in window.all(color):
-        for other_tile in window.all(color):
-
-
-            if tile.x == other_tile.x + 120 and tile.y == other_tile.y - 120:
-
-                for other_tile in window.all(color):
-
-                    if tile.x == other_tile.x + 240 and tile.y == other_tile.y - 240:
-
-                        for other_tile in window.all(color):
+    found = game.connects(color, board.column_of(x_coord), board.row_of(y_coord))
+    if verify:
+        assert found == game.check(color), "Win check disagrees with a full board scan"
+    return found
 
-                            if tile.x == other_tile.x + 360 and tile.y == other_tile.y - 360:
-
-                                north_east_count = 3
-
-    for tile in window.all(color):
-        for other_tile in window.all(color):
-
-            if tile.x == other_tile.x + 120 and tile.y == other_tile.y:
-
-                for other_tile in window.all(color):
-
-                    if tile.x == other_tile.x + 240 and tile.y == other_tile.y:
-
-                        for other_tile in window.all(color):
-
-                            if tile.x == other_tile.x + 360 and tile.y == other_tile.y:
-
-                                east_count = 3
-
-    for tile in window.all(color):
-        for other_tile in window.all(color):
-
-            if tile.x == other_tile.x + 120 and tile.y == other_tile.y + 120:
-
-                for other_tile in window.all(color):
-
-                    if tile.x == other_tile.x + 240 and tile.y == other_tile.y + 240:
-
-                        for other_tile in window.all(color):
-
-                            if tile.x == other_tile.x + 360 and tile.y == other_tile.y + 360:
-
-                                 south_east_count = 3
+# Add the finished game to the record file
+def save(result):
+    if records is not None:
+        record.append(records, game.moves, result, game.first)
 
 def move_arrow(key):
-    global turn, tile_count, x_coord, y_coord
-
-    for arrow in window.all("arrow"):
-        if key == "Right":
-            if arrow.x != 745:
-                arrow.move(120, 0)
-        if key == "Left":
-            if arrow.x != 25:
-                arrow.move(-120, 0)
-
-        if key == "Return":
-            tile_count = 1
-            overall_count = 0
-
-            for tile in window.all("tile"):
-
-                if tile.x == arrow.x:
-                    tile_count += 1
-            if tile_count != 7:
-                location = 865 - (tile_count * 120)
-                y_coord = location
-                x_coord = arrow.x
-
-                if turn == "blue":
-                    remove_arrow()
-                    make_red()
-                    fill_blue(location)
-                    check("blue")
-                    if south_count == 3 or east_count == 3 or south_east_count == 3 or north_east_count == 3:
-                        end_board = window.image(0, 0, "End Board.gif")
-                        end_board.group("removable")
-                        blue_wins = window.image(50, 295, "Blue Wins!.gif")
-                        blue_wins.group("removable")
-                        window.offKeyPress(move_arrow)
-                        window.onKeyPress(restart)
-                    turn = "red"
-
-                elif turn == "red":
-                    remove_arrow()
-                    make_blue()
-                    fill_red(location)
-                    check("red")
-                    if south_count == 3 or east_count == 3 or south_east_count == 3 or north_east_count == 3:
-                        end_board = window.image(0, 0, "End Board.gif")
-                        end_board.group("removable")
-                        red_wins = window.image(50, 295, "Red Wins!.gif")
-                        red_wins.group("removable")
-                        window.offKeyPress(move_arrow)
-                        window.onKeyPress(restart)
-                    turn = "blue"
-
-            for tile in window.all("tile"):
-                overall_count += 1
-                if overall_count == 42:
-                    tie_game = window.image(50, 295, "Tie Game!.gif")
+    global turn, x_coord, y_coord
+
+    # Draw the move and anything it ends the game with in one go
+    with window.batch():
+        for arrow in window.all("arrow"):
+            if key == "Right":
+                if arrow.x != 745:
+                    arrow.move(120, 0)
+            if key == "Left":
+                if arrow.x != 25:
+                    arrow.move(-120, 0)
+
+            if key == "Return":
+                column = board.column_of(arrow.x)
+
+                if game.playable(column):
+                    location = board.y_of(game.heights[column])
+                    y_coord = location
+                    x_coord = arrow.x
+
+                    if turn == "blue":
+                        remove_arrow()
+                        make_red()
+                        fill_blue(location)
+                        if check("blue"):
+                            end_board = window.image(0, 0, "End Board")
+                            end_board.group("removable")
+                            blue_wins = window.image(50, 295, "Blue Wins!")
+                            blue_wins.group("removable")
+                            save("blue")
+                            window.offKeyPress(move_arrow)
+                            window.onKeyPress(restart)
+                        turn = "red"
+
+                    elif turn == "red":
+                        remove_arrow()
+                        make_blue()
+                        fill_red(location)
+                        if check("red"):
+                            end_board = window.image(0, 0, "End Board")
+                            end_board.group("removable")
+                            red_wins = window.image(50, 295, "Red Wins!")
+                            red_wins.group("removable")
+                            save("red")
+                            window.offKeyPress(move_arrow)
+                            window.onKeyPress(restart)
+                        turn = "blue"
+
+                if game.full():
+                    tie_game = window.image(50, 295, "Tie Game!")
                     tie_game.group("removable")
-                    end_board = window.image(0, 0, "End Board.gif")
+                    end_board = window.image(0, 0, "End Board")
                     end_board.group("removable")
                     window.offKeyPress(move_arrow)
                     window.onKeyPress(restart)
+                    if not game.check("red") and not game.check("blue"):
+                        save("draw")
+
+    if key == "Return":
+        computer_move()
+
+# Let the computer take its turn
+def computer_move():
+    global opponent
+    if turn == computer and not game.full() and not game.check("red") and not game.check("blue"):
+        if opponent is None:
+            opening = book.book("Opening Book.bin") if os.path.exists("Opening Book.bin") else None
+            opponent = search.negamax(depth=42, milliseconds=300, book=opening)
+        column = opponent.move(game, turn)
+        for arrow in window.all("arrow"):
+            arrow.relocate(board.x_of(column), arrow.y)
+        move_arrow("Return")
 
 def restart(key):
     if key == "space":
-        for shape in window.all("removable"):
-            window.remove(shape)
-            window.onKeyPress(move_arrow)
-            window.offKeyPress(restart)
+        game.reset()
+        with window.batch():
+            window.removeAll("removable")
+        window.onKeyPress(move_arrow)
+        window.offKeyPress(restart)
+        computer_move()
     if key == "Escape":
         window.close()
 
 window.onKeyPress(move_arrow)
 
 make_red()
+computer_move()
 
 window.open()
 
@@ -0,0 +1,74 @@
+#########################################################################
+# Win and tie detection for many boards at once, with NumPy.
+#
+# Boards come either as an (N, 6, 7) integer array, with row 0 at the
+# top as drawn and cells holding 0 (empty), 1 (red) or 2 (blue), or as
+# an (N, 2) array of red and blue bitboards laid out as in board.py.
+# Both look for lines in the four directions check() tests: south,
+# east, south-east and north-east.
+#########################################################################
+
+import numpy
+import board
+
+EMPTY = 0
+RED = 1
+BLUE = 2
+
+# Bit shifts for south, east, south-east and north-east on packed grids.
+PACKED = (8, 1, 9, 7)
+
+# Pack a stack of (N, 6, 7) booleans into one integer per board, each
+# row taking 8 bits so that lines can't wrap from one row to the next.
+def pack(cells):
+    rows = numpy.zeros((len(cells), 8), dtype=numpy.uint8)
+    rows[:, :board.HEIGHT] = numpy.packbits(cells, axis=2, bitorder="little").reshape(len(cells), board.HEIGHT)
+    return rows.view(numpy.uint64).ravel()
+
+# Find the bitboards with four in a row in an array of them, given the
+# bit shifts for south, east, south-east and north-east.
+def lines(bits, directions):
+    found = numpy.zeros(len(bits), dtype=bool)
+    for shift in directions:
+        shift = numpy.uint64(shift)
+        pairs = bits & (bits >> shift)
+        found |= (pairs & (pairs >> (shift + shift))) != 0
+    return found
+
+def status(boards):
+    """Get the winner and whether the game is over for every board.
+
+    Returns two arrays: the winner of each board as 0 (nobody), 1 (red)
+    or 2 (blue), and True for each board that is won or full. A board
+    where both colors have four in a row, which no game can reach, gets
+    winner 3.
+    """
+    boards = numpy.asarray(boards)
+    if boards.ndim == 3 and boards.shape[1:] == (board.HEIGHT, board.WIDTH):
+        reds = pack(boards == RED)
+        blues = pack(boards == BLUE)
+        red = lines(reds, PACKED)
+        blue = lines(blues, PACKED)
+        full = (reds | blues) == pack(numpy.ones((1, board.HEIGHT, board.WIDTH), dtype=bool))[0]
+    elif boards.ndim == 2 and boards.shape[1] == 2:
+        boards = boards.astype(numpy.uint64, copy=False)
+        red = lines(boards[:, 0], board.DIRECTIONS)
+        blue = lines(boards[:, 1], board.DIRECTIONS)
+        full = (boards[:, 0] | boards[:, 1]) == numpy.uint64(board.FULL)
+    else:
+        raise ValueError("Boards should be an (N, 6, 7) array or an (N, 2) array of bitboards, not " + str(boards.shape))
+
+    winners = red.astype(numpy.int8) | (blue.astype(numpy.int8) << 1)
+    return winners, (winners != 0) | full
+
+def grids(bitboards):
+    """Turn an (N, 2) array of bitboards into an (N, 6, 7) array of cells."""
+    bitboards = numpy.asarray(bitboards, dtype=numpy.uint64)
+    cells = numpy.zeros((len(bitboards), board.HEIGHT, board.WIDTH), dtype=numpy.int8)
+    for column in range(board.WIDTH):
+        for row in range(board.HEIGHT):
+            bit = numpy.uint64(column * board.H1 + row)
+            top = board.HEIGHT - 1 - row
+            cells[:, top, column] += ((bitboards[:, 0] >> bit) & numpy.uint64(1)).astype(numpy.int8) * RED
+            cells[:, top, column] += ((bitboards[:, 1] >> bit) & numpy.uint64(1)).astype(numpy.int8) * BLUE
+    return cells
@@ -0,0 +1,342 @@
+#########################################################################
+# Benchmarks for the game loop and the intrographics calls it makes.
+#
+# Everything runs headless, so the numbers don't depend on a display.
+# Each benchmark times a batch of operations several times over, then
+# runs one more batch under tracemalloc to count the memory blocks an
+# operation leaves allocated and the peak memory it uses. Batches of
+# quick operations are made long enough to time reliably. Results are
+# written as JSON, and can be saved as a baseline that later runs are
+# compared against by their fastest batch.
+#
+# Example:  python benchmark.py --save baseline.json
+#           python benchmark.py --baseline baseline.json
+#########################################################################
+
+import io
+import os
+import gc
+import sys
+import json
+import time
+import runpy
+import argparse
+import contextlib
+import platform
+import tracemalloc
+
+os.environ["INTROGRAPHICS_BACKEND"] = "headless"
+
+import board
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GAME = os.path.join(HERE, "Connect 4!.py")
+
+# Shortest time in seconds a batch is timed for; quicker batches would
+# mostly measure the timer and the noise around it.
+MINIMUM = 0.05
+ROUNDS = 32
+
+# A 42-tile game that nobody wins, red first.
+DRAW = tuple(map(int, "330254564223355224331121550404466660106011"))
+
+CASES = []
+
+def case(name, number=1000, repeat=7):
+    """Register a benchmark that times number operations, repeat times."""
+    def register(function):
+        CASES.append((name, number, repeat, function))
+        return function
+    return register
+
+# Start a fresh copy of the game in its own window, with recording off.
+def start():
+    # run_path() hands back a copy of the script's globals, so reach the
+    # ones its functions use through one of them.
+    game = runpy.run_path(GAME, run_name="benchmark")["check"].__globals__
+    game["records"] = None
+    return game
+
+# Drop tiles without going through the window, leaving check() looking
+# at the last one.
+def play(game, moves):
+    game["game"].reset()
+    color = "red"
+    for column in moves:
+        row = game["game"].drop(color, column)
+        game["x_coord"], game["y_coord"] = board.x_of(column), board.y_of(row)
+        color = board.other(color)
+    return board.other(color)
+
+# Play moves through the Return key, as a person would.
+def press(game, moves):
+    for column in moves:
+        for arrow in game["window"].all("arrow"):
+            arrow.relocate(board.x_of(column), arrow.y)
+        game["move_arrow"]("Return")
+
+# Each benchmark takes a fresh game and returns the operation to time
+# and a function that undoes its work between batches (or None).
+
+@case("check empty board", number=10000)
+def check_empty(game):
+    play(game, ())
+    game["x_coord"], game["y_coord"] = board.x_of(3), board.y_of(0)
+    return (lambda: game["check"]("red")), None
+
+@case("check midgame", number=10000)
+def check_midgame(game):
+    color = play(game, DRAW[:21])
+    return (lambda: game["check"](color)), None
+
+@case("check full board", number=10000)
+def check_full(game):
+    color = play(game, DRAW)
+    return (lambda: game["check"](color)), None
+
+@case("move_arrow Return", number=len(DRAW))
+def move_arrow(game):
+    moves = iter(DRAW)
+
+    def operation():
+        press(game, (next(moves),))
+
+    def reset():
+        nonlocal moves
+        game["restart"]("space")
+        moves = iter(DRAW)
+    return operation, reset
+
+def shapes(count):
+    def benchmark(game):
+        window = game["window"]
+        for i in range(count):
+            shape = window.image(board.x_of(i % board.WIDTH), board.y_of(i // board.WIDTH % board.HEIGHT), "Red Tile")
+            if i % 2 == 0:
+                shape.group("tile")
+        return (lambda: window.all("tile")), None
+    return benchmark
+
+for count in (10, 100, 1000):
+    case("window.all with " + str(count) + " shapes", number=1000)(shapes(count))
+
+@case("window.image", number=100)
+def image(game):
+    window = game["window"]
+    return (lambda: window.image(board.x_of(3), board.y_of(0), "Red Tile").group("benchmark")), (lambda: window.removeAll("benchmark"))
+
+# Put all 42 tiles of a finished game on the board, one image each.
+def tiles(window):
+    color = "Red Tile"
+    heights = [0] * board.WIDTH
+    for column in DRAW:
+        window.image(board.x_of(column), board.y_of(heights[column]), color).group("benchmark")
+        heights[column] += 1
+        color = "Blue Tile" if color == "Red Tile" else "Red Tile"
+
+@case("draw a full board", number=1)
+def full_board(game):
+    window = game["window"]
+    return (lambda: tiles(window)), (lambda: window.removeAll("benchmark"))
+
+@case("draw a full board in a batch", number=1)
+def full_board_batch(game):
+    window = game["window"]
+
+    def draw():
+        with window.batch():
+            tiles(window)
+
+    def clear():
+        with window.batch():
+            window.removeAll("benchmark")
+    return draw, clear
+
+@case("window.remove", number=100)
+def remove(game):
+    window = game["window"]
+    made = []
+
+    def fill():
+        made.extend(window.image(board.x_of(3), board.y_of(0), "Red Tile") for i in range(100))
+    fill()
+    return (lambda: window.remove(made.pop())), fill
+
+@case("restart after a full board", number=1, repeat=15)
+def restart(game):
+    press(game, DRAW)
+    return (lambda: game["restart"]("space")), (lambda: press(game, DRAW))
+
+# Time one batch of operations in nanoseconds each.
+def batch(operation, number):
+    gc.collect()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        begin = time.perf_counter_ns()
+        for i in range(number):
+            operation()
+        return (time.perf_counter_ns() - begin) / number
+    finally:
+        if enabled:
+            gc.enable()
+
+# Time several batches in a row, undoing each one's work untimed, in
+# nanoseconds per operation.
+def sample(operation, reset, number, rounds):
+    total = 0
+    for i in range(rounds):
+        total += batch(operation, number)
+        if reset is not None:
+            reset()
+    return total / rounds
+
+# Make a timing last at least MINIMUM seconds: with more operations per
+# batch when nothing needs undoing, or else with more batches (up to
+# ROUNDS of them, since undoing can take longer than the work itself).
+def calibrate(operation, reset, number):
+    rounds = 1
+    while sample(operation, reset, number, rounds) * number * rounds < MINIMUM * 1e9:
+        if reset is None:
+            number *= 2
+        elif rounds < ROUNDS:
+            rounds *= 2
+        else:
+            break
+    return number, rounds
+
+def measure(cases):
+    """Run some benchmarks and return their results by name.
+
+    Every benchmark gets its own game, and they take turns timing a
+    batch, so a slow spell on the machine hits them all a little
+    instead of one of them the whole time.
+    """
+    games = []
+    timed = []
+    try:
+        for name, number, repeat, function in cases:
+            game = start()
+            games.append(game)
+            operation, reset = function(game)
+            number, rounds = calibrate(operation, reset, number)  # Also warms up caches
+            timed.append((name, number, rounds, repeat, operation, reset, []))
+
+        for i in range(max([repeat for name, number, rounds, repeat, operation, reset, timings in timed] or [0])):
+            for name, number, rounds, repeat, operation, reset, timings in timed:
+                if len(timings) < repeat:
+                    timings.append(sample(operation, reset, number, rounds))
+
+        results = {}
+        for name, number, rounds, repeat, operation, reset, timings in timed:
+            gc.collect()
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            for i in range(number):
+                operation()
+            after = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+
+            timings.sort()
+            results[name] = {
+                "operations": number,
+                "rounds": rounds,
+                "repeat": repeat,
+                "median ns": timings[len(timings) // 2],
+                "min ns": timings[0],
+                "max ns": timings[-1],
+                "blocks per operation": blocks / number,
+                "peak bytes": peak,
+            }
+        return results
+    finally:
+        # The first window closes the rest with it, so close it last.
+        with contextlib.redirect_stdout(io.StringIO()):  # close() prints a blank line
+            for game in reversed(games):
+                game["window"].close()
+
+def run(selected=None):
+    """Run the benchmarks whose names contain any of the given words."""
+    os.chdir(HERE)  # The game loads its art from here
+    results = {"python": platform.python_version(), "implementation": platform.python_implementation(), "cases": {}}
+    results["cases"] = measure([entry for entry in CASES if not selected or any(word in entry[0] for word in selected)])
+    return results
+
+# Whether a benchmark's fastest batch is slower than the baseline allows.
+def slower(result, old, tolerance):
+    return result["min ns"] > old["min ns"] * (1 + tolerance)
+
+def confirm(results, baseline, tolerance, retries):
+    """Time the benchmarks that look slower than the baseline again.
+
+    Each keeps its fastest result: a busy moment on the machine can slow
+    down one run of a benchmark, but not every run of it.
+    """
+    for attempt in range(retries):
+        names = [name for name, result in results["cases"].items()
+                 if name in baseline["cases"] and slower(result, baseline["cases"][name], tolerance)]
+        if not names:
+            break
+        for name, result in measure([entry for entry in CASES if entry[0] in names]).items():
+            if result["min ns"] < results["cases"][name]["min ns"]:
+                results["cases"][name] = result
+
+def compare(results, baseline, tolerance):
+    """List the benchmarks that got slower or allocate more than the baseline."""
+    problems = []
+    for name, result in results["cases"].items():
+        old = baseline["cases"].get(name)
+        if old is None:
+            continue
+        if slower(result, old, tolerance):
+            problems.append("%s: %.0f ns, was %.0f ns (%+.0f%%)" % (name, result["min ns"], old["min ns"], 100 * (result["min ns"] / old["min ns"] - 1)))
+        if result["blocks per operation"] > old["blocks per operation"] * (1 + tolerance) + 1:
+            problems.append("%s: %.1f blocks per operation, was %.1f" % (name, result["blocks per operation"], old["blocks per operation"]))
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Connect 4 game loop and intrographics.")
+    parser.add_argument("names", nargs="*", help="only run benchmarks whose names contain one of these")
+    parser.add_argument("--output", default=None, help="write the JSON results here instead of printing them")
+    parser.add_argument("--save", default=None, help="also save the results as a baseline file")
+    parser.add_argument("--baseline", default=None, help="fail if any benchmark's fastest batch is slower than in this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown against the baseline (0.5 is 50%%)")
+    parser.add_argument("--retries", type=int, default=3, help="times to rerun a benchmark that looks slower before failing it")
+    options = parser.parse_args()
+
+    # run() moves to this folder, so fix file names to where they were given.
+    for option in ("output", "save"):
+        if getattr(options, option) is not None:
+            setattr(options, option, os.path.abspath(getattr(options, option)))
+
+    baseline = None
+    if options.baseline is not None:
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+
+    results = run(options.names)
+    if baseline is not None:
+        confirm(results, baseline, options.tolerance, options.retries)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if options.output is None:
+        print(text)
+    else:
+        with open(options.output, "w") as f:
+            f.write(text + "\n")
+    if options.save is not None:
+        with open(options.save, "w") as f:
+            f.write(text + "\n")
+
+    if baseline is not None:
+        problems = compare(results, baseline, options.tolerance)
+        for problem in problems:
+            print("SLOWER " + problem, file=sys.stderr)
+        if problems:
+            print(str(len(problems)) + " benchmark(s) regressed against " + options.baseline, file=sys.stderr)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,177 @@
+#########################################################################
+# Connect 4 game state kept as a pair of bitboards.
+#
+# Each column takes 7 bits (6 rows plus an empty sentinel bit on top),
+# so cell (column, row) is bit column * 7 + row, with row 0 at the
+# bottom of the board. The sentinel bits keep shifted lines from
+# wrapping into the next column.
+#########################################################################
+
+import random
+
+WIDTH = 7
+HEIGHT = 6
+H1 = HEIGHT + 1
+
+# Bit masks for the bottom row and the whole playable board.
+BOTTOM = sum(1 << (column * H1) for column in range(WIDTH))
+FULL = BOTTOM * ((1 << HEIGHT) - 1)
+
+# Bit shifts for the four directions check() has always tested.
+SOUTH = 1
+EAST = H1
+SOUTH_EAST = H1 - 1
+NORTH_EAST = H1 + 1
+DIRECTIONS = (SOUTH, EAST, SOUTH_EAST, NORTH_EAST)
+
+# Pixel layout of the board art.
+LEFT = 25
+BOTTOM_Y = 745
+SPACING = 120
+
+COLORS = ("red", "blue")
+
+# Columns from the center out, the order worth trying moves in.
+ORDER = (3, 2, 4, 1, 5, 0, 6)
+
+# Bit masks for each column and the bottom cell of each column.
+COLUMNS = tuple(((1 << HEIGHT) - 1) << (column * H1) for column in range(WIDTH))
+BOTTOMS = tuple(1 << (column * H1) for column in range(WIDTH))
+
+# Random keys for hashing positions, one per bit for the player who
+# moved first and one per bit for the player who moved second.
+def keys(seed):
+    generator = random.Random(seed)
+    return tuple(tuple(generator.getrandbits(64) for bit in range(WIDTH * H1)) for side in range(2))
+
+ZOBRIST = keys(2019)
+
+# Check a single bitboard for four in a row.
+def won(bits):
+    for shift in DIRECTIONS:
+        pairs = bits & (bits >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+# Get the cells a tile could be dropped into.
+def possible(mask):
+    return (mask + BOTTOM) & FULL
+
+# Get the empty cells that would give a bitboard four in a row.
+def winning(bits, mask):
+    # Vertical
+    found = (bits << 1) & (bits << 2) & (bits << 3)
+
+    for shift in (EAST, SOUTH_EAST, NORTH_EAST):
+        pairs = (bits << shift) & (bits << (2 * shift))
+        found |= pairs & (bits << (3 * shift))
+        found |= pairs & (bits >> shift)
+        pairs = (bits >> shift) & (bits >> (2 * shift))
+        found |= pairs & (bits << shift)
+        found |= pairs & (bits >> (3 * shift))
+
+    return found & (FULL ^ mask)
+
+# Flip a bitboard left to right.
+def mirror(bits):
+    flipped = 0
+    for column in range(WIDTH):
+        flipped |= ((bits >> (column * H1)) & ((1 << H1) - 1)) << ((WIDTH - 1 - column) * H1)
+    return flipped
+
+# Get the other player's color.
+def other(color):
+    return "blue" if color == "red" else "red"
+
+# Get the bit for a board cell.
+def cell(column, row):
+    return 1 << (column * H1 + row)
+
+# Convert between board cells and the canvas pixels of a tile.
+def column_of(x):
+    return (x - LEFT) // SPACING
+
+def row_of(y):
+    return (BOTTOM_Y - y) // SPACING
+
+def x_of(column):
+    return LEFT + column * SPACING
+
+def y_of(row):
+    return BOTTOM_Y - row * SPACING
+
+# The game has always put a tile at 865 - tile_count * 120, counting the
+# new tile along with the ones already in its column.
+assert all(y_of(row) == 865 - (row + 1) * 120 and row_of(y_of(row)) == row for row in range(HEIGHT)), "Board rows don't match the board art"
+
+class board:
+    """A 7x6 Connect 4 position."""
+
+    def __init__(self):
+        self.bits = {"red": 0, "blue": 0}
+        self.heights = [0] * WIDTH
+        self.count = 0
+        self.hash = 0
+        self.moves = []
+        self.first = None
+
+    # Bitboard of every occupied cell.
+    def mask(self):
+        return self.bits["red"] | self.bits["blue"]
+
+    def position(self, color):
+        """Get the bitboards of one player's tiles and of every tile."""
+        return self.bits[color], self.mask()
+
+    def playable(self, column):
+        """Check if a column has room for another tile."""
+        return self.heights[column] < HEIGHT
+
+    def drop(self, color, column):
+        """Drop a tile of the given color and return the row it lands on."""
+        row = self.heights[column]
+        self.bits[color] |= cell(column, row)
+        self.hash ^= ZOBRIST[self.count & 1][column * H1 + row]
+        self.heights[column] = row + 1
+        self.count += 1
+        self.moves.append(column)
+        if self.first is None:
+            self.first = color
+        return row
+
+    def full(self):
+        """Check if every cell has a tile."""
+        return self.count == WIDTH * HEIGHT
+
+    def check(self, color):
+        """Check if the given color has four in a row."""
+        return won(self.bits[color])
+
+    def connects(self, color, column, row):
+        """Check if the tile on a cell is part of four in a row."""
+        bits = self.bits[color]
+        start = cell(column, row)
+        for shift in DIRECTIONS:
+            count = 1
+            neighbor = start << shift
+            while neighbor & bits:
+                count += 1
+                neighbor <<= shift
+            neighbor = start >> shift
+            while neighbor & bits:
+                count += 1
+                neighbor >>= shift
+            if count >= 4:
+                return True
+        return False
+
+    def reset(self):
+        """Empty the board."""
+        self.bits["red"] = 0
+        self.bits["blue"] = 0
+        self.heights = [0] * WIDTH
+        self.count = 0
+        self.hash = 0
+        self.moves = []
+        self.first = None
@@ -0,0 +1,126 @@
+#########################################################################
+# An opening book: searched scores and best moves for early positions.
+#
+# The book file is an 8-byte header followed by fixed-size records
+# sorted by position key. A position's key is the tiles of the player
+# to move plus the mask of every tile, which is unique for each
+# position. Mirror images share one record under the smaller key.
+#
+# Build a book with:  python book.py --plies 6 --depth 12
+#########################################################################
+
+import os
+import mmap
+import struct
+import argparse
+import board
+import search
+
+MAGIC = b"C4BOOK\x00\x01"
+RECORD = struct.Struct(">QhB")  # Key, score, best column
+KEY = struct.Struct(">Q")
+
+# Get the key of a position and whether it is the mirror image's key.
+def key(current, mask):
+    plain = current + mask
+    flipped = board.mirror(current) + board.mirror(mask)
+    if flipped < plain:
+        return flipped, True
+    return plain, False
+
+class book:
+    """An opening book read in place from a memory-mapped file."""
+
+    def __init__(self, filename):
+        self.file = open(filename, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size < len(MAGIC):
+            self.file.close()
+            raise ValueError("Not an opening book: " + str(filename))
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError("Not an opening book: " + str(filename))
+        self.count = (size - len(MAGIC)) // RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def lookup(self, current, mask):
+        """Get (score, column) for the player to move, or None."""
+        wanted, flipped = key(current, mask)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            found = KEY.unpack_from(self.data, len(MAGIC) + middle * RECORD.size)[0]
+            if found < wanted:
+                low = middle + 1
+            elif found > wanted:
+                high = middle
+            else:
+                found, score, column = RECORD.unpack_from(self.data, len(MAGIC) + middle * RECORD.size)
+                if flipped:
+                    column = board.WIDTH - 1 - column
+                return score, column
+        return None
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+# Find every unfinished position up to some number of tiles, one per
+# mirror pair, as (key, current, mask, moves, code).
+def positions(plies):
+    found = {}
+    frontier = [(0, 0, 0)]
+    for moves in range(plies + 1):
+        following = []
+        for current, mask, code in frontier:
+            unique, flipped = key(current, mask)
+            if unique in found:
+                continue
+            found[unique] = (unique, current, mask, moves, code)
+            if moves == plies:
+                continue
+            playable = board.possible(mask)
+            wins = board.winning(current, mask)
+            for column in board.ORDER:
+                move = playable & board.COLUMNS[column]
+                if move and not move & wins:
+                    child = code ^ board.ZOBRIST[moves & 1][move.bit_length() - 1]
+                    following.append((current ^ mask, mask | move, child))
+        frontier = following
+    return sorted(found.values())
+
+def build(filename, plies, depth, milliseconds=None, report=None):
+    """Search every position up to some number of tiles and write a book."""
+    player = search.negamax(depth=depth, milliseconds=milliseconds)
+    entries = positions(plies)
+    with open(filename, "wb") as f:
+        f.write(MAGIC)
+        for number, (unique, current, mask, moves, code) in enumerate(entries):
+            column = player.best(current, mask, moves, code)
+            if unique != current + mask:
+                column = board.WIDTH - 1 - column
+            f.write(RECORD.pack(unique, player.score, column))
+            if report is not None:
+                report(number + 1, len(entries))
+    return len(entries)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a Connect 4 opening book.")
+    parser.add_argument("--plies", type=int, default=6, help="book positions with up to this many tiles")
+    parser.add_argument("--depth", type=int, default=12, help="search depth for each position")
+    parser.add_argument("--milliseconds", type=int, default=None, help="search time limit for each position")
+    parser.add_argument("--output", default="Opening Book.bin", help="file to write")
+    options = parser.parse_args()
+
+    def report(done, total):
+        if done % 100 == 0 or done == total:
+            print("\r" + str(done) + "/" + str(total) + " positions", end="", flush=True)
+
+    count = build(options.output, options.plies, options.depth, options.milliseconds, report)
+    print("\nWrote " + str(count) + " positions to " + options.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,657 @@
+#########################################################################
+# A stand-in for the parts of tkinter that intrographics uses.
+#
+# Nothing here needs a display. Shapes, bindings and timers live in
+# memory, and time only passes when the program says so: after(ms)
+# with no function moves a virtual clock forward, and update() runs
+# whatever events and timers are due. That lets a script type keys into
+# a game and run it at full speed.
+#########################################################################
+
+import collections
+import heapq
+import itertools
+import base64
+import struct
+import zlib
+
+# Named colors understood by winfo_rgb, as in Tk 8.6.
+COLORS = {
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+    "red": (255, 0, 0),
+    "green": (0, 128, 0),
+    "lime": (0, 255, 0),
+    "blue": (0, 0, 255),
+    "yellow": (255, 255, 0),
+    "cyan": (0, 255, 255),
+    "magenta": (255, 0, 255),
+    "gray": (128, 128, 128),
+    "grey": (128, 128, 128),
+    "silver": (192, 192, 192),
+    "maroon": (128, 0, 0),
+    "olive": (128, 128, 0),
+    "navy": (0, 0, 128),
+    "purple": (128, 0, 128),
+    "teal": (0, 128, 128),
+    "orange": (255, 165, 0),
+    "brown": (165, 42, 42),
+    "pink": (255, 192, 203),
+    "gray99": (252, 252, 252),
+}
+
+class TclError(Exception):
+    pass
+
+# The fields of an event handed to a binding.
+class Event:
+    def __init__(self, widget, **fields):
+        self.widget = widget
+        self.keysym = ""
+        self.x = 0
+        self.y = 0
+        self.__dict__.update(fields)
+
+# Anything with a master, options and bindings.
+class Misc:
+    def __init__(self, master=None, **options):
+        self.master = master
+        self.tk = master.tk if master is not None else self
+        self.options = dict(options)
+        self.bindings = {}
+
+    def configure(self, **options):
+        self.options.update(options)
+
+    config = configure
+
+    def cget(self, option):
+        return self.options.get(option, "")
+
+    def bind(self, sequence, function):
+        self.bindings[sequence] = function
+
+    def event_generate(self, sequence, when="tail", **fields):
+        self.tk.events.append((self, sequence, Event(self, **fields)))
+        if when == "now":
+            self.tk.update()
+
+    def after(self, milliseconds, function=None, *args):
+        return self.tk.after(milliseconds, function, *args)
+
+    def after_cancel(self, identifier):
+        self.tk.after_cancel(identifier)
+
+    def update(self):
+        self.tk.update()
+
+    def update_idletasks(self):
+        pass
+
+    def winfo_rgb(self, color):
+        return self.tk.winfo_rgb(color)
+
+    def pack(self):
+        pass
+
+    def destroy(self):
+        pass
+
+class Wm(Misc):
+    def __init__(self, master=None):
+        super().__init__(master)
+        self.geometry = (1, 1, 0, 0)
+        self.title = ""
+        self.protocols = {}
+
+    def withdraw(self):
+        pass
+
+    def deiconify(self):
+        pass
+
+    def protocol(self, name, function):
+        self.protocols[name] = function
+
+    def wm_title(self, title):
+        self.title = title
+
+    def wm_geometry(self, geometry):
+        size, x, y = geometry.split("+")
+        width, height = size.split("x")
+        self.geometry = (int(width), int(height), int(x), int(y))
+
+    def winfo_width(self):
+        return self.geometry[0]
+
+    def winfo_height(self):
+        return self.geometry[1]
+
+class Tk(Wm):
+    """The root of a headless display, with its event queue and clock."""
+
+    def __init__(self):
+        super().__init__()
+        self.time = 0
+        self.events = collections.deque()
+        self.timers = []
+        self.cancelled = set()
+        self.ids = itertools.count(1)
+
+    def after(self, milliseconds, function=None, *args):
+        if function is None:
+            self.advance(int(milliseconds))
+            return None
+        identifier = "after#" + str(next(self.ids))
+        heapq.heappush(self.timers, (self.time + int(milliseconds), identifier, function, args))
+        return identifier
+
+    def after_cancel(self, identifier):
+        self.cancelled.add(identifier)
+
+    # Move the clock forward, firing timers at the time they were due.
+    def advance(self, milliseconds):
+        end = self.time + milliseconds
+        while self.timers and self.timers[0][0] <= end:
+            self.time = self.timers[0][0]
+            self.update()
+        self.time = end
+
+    def update(self):
+        while self.events:
+            widget, sequence, event = self.events.popleft()
+            function = widget.bindings.get(sequence)
+            if function is not None:
+                function(event)
+        while self.timers and self.timers[0][0] <= self.time:
+            due, identifier, function, args = heapq.heappop(self.timers)
+            if identifier in self.cancelled:
+                self.cancelled.remove(identifier)
+            else:
+                function(*args)
+            while self.events:
+                widget, sequence, event = self.events.popleft()
+                function = widget.bindings.get(sequence)
+                if function is not None:
+                    function(event)
+
+    # Nothing blocks here; the caller drives the loop with update().
+    def mainloop(self):
+        self.update()
+
+    def quit(self):
+        self.events.clear()
+        self.timers = []
+        self.cancelled = set()
+
+    def winfo_rgb(self, color):
+        color = str(color).lower()
+        if color.startswith("#") and len(color) == 7:
+            rgb = (int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16))
+        elif color in COLORS:
+            rgb = COLORS[color]
+        else:
+            raise TclError('unknown color name "' + color + '"')
+        return tuple(c * 257 for c in rgb)
+
+class Toplevel(Wm):
+    def __init__(self, master):
+        super().__init__(master)
+
+class Canvas(Misc):
+    """A canvas that remembers its items instead of drawing them."""
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.items = {}
+        self.ids = itertools.count(1)
+
+    def create(self, kind, coords, options):
+        identifier = next(self.ids)
+        self.items[identifier] = [kind, [c for c in coords], dict(options)]
+        return identifier
+
+    def create_rectangle(self, *coords, **options):
+        return self.create("rectangle", coords, options)
+
+    def create_oval(self, *coords, **options):
+        return self.create("oval", coords, options)
+
+    def create_polygon(self, *coords, **options):
+        return self.create("polygon", coords, options)
+
+    def create_line(self, *coords, **options):
+        return self.create("line", coords, options)
+
+    def create_text(self, *coords, **options):
+        return self.create("text", coords, options)
+
+    def create_image(self, *coords, **options):
+        return self.create("image", coords, options)
+
+    def create_window(self, *coords, **options):
+        return self.create("window", coords, options)
+
+    def coords(self, identifier, *coords):
+        item = self.items[identifier]
+        if coords:
+            flat = []
+            for c in coords:
+                if isinstance(c, (tuple, list)):
+                    flat.extend(c)
+                else:
+                    flat.append(c)
+            item[1] = flat
+        return list(item[1])
+
+    def itemconfig(self, identifier, **options):
+        self.items[identifier][2].update(options)
+
+    itemconfigure = itemconfig
+
+    def itemcget(self, identifier, option):
+        return self.items[identifier][2].get(option, "")
+
+    def delete(self, *identifiers):
+        for identifier in identifiers:
+            self.items.pop(identifier, None)
+
+    def bbox(self, identifier):
+        kind, coords, options = self.items[identifier]
+        if kind == "image":
+            img = options.get("image")
+            x, y = coords[0], coords[1]
+            return (x, y, x + img.width(), y + img.height())
+        if kind == "text":
+            # Roughly what Tk reports for a proportional font.
+            font = options.get("font", ("Helvetica", 16))
+            size = font[1] if isinstance(font, tuple) else 16
+            lines = str(options.get("text", "")).split("\n")
+            x, y = coords[0], coords[1]
+            width = int(max(len(line) for line in lines) * size * 0.6) + 1
+            return (x, y, x + width, y + int(len(lines) * size * 1.5) + 1)
+        if kind == "window":
+            x, y = coords[0], coords[1]
+            return (x, y, x + 100, y + 30)
+        xs, ys = coords[0::2], coords[1::2]
+        return (min(xs), min(ys), max(xs), max(ys))
+
+    def find_overlapping(self, x1, y1, x2, y2):
+        found = []
+        for identifier in self.items:
+            left, top, right, bottom = self.bbox(identifier)
+            if left <= x2 and right >= x1 and top <= y2 and bottom >= y1:
+                found.append(identifier)
+        return tuple(found)
+
+class Button(Misc):
+    def invoke(self):
+        command = self.options.get("command")
+        if command is not None:
+            return command()
+
+class Entry(Misc):
+    pass
+
+class StringVar:
+    def __init__(self, master=None, value=""):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+class PhotoImage:
+    """An image whose pixels are decoded from a GIF only when first needed."""
+
+    def __init__(self, master=None, file=None, width=0, height=0, data=None, format=None):
+        self.filename = file
+        self.pixels = None
+        self.data = None
+        if file is not None:
+            with open(file, "rb") as f:
+                self.data = f.read()
+        elif data is not None:
+            self.data = base64.b64decode(data) if isinstance(data, str) else bytes(data)
+
+        if self.data is None:
+            self.size = (int(width), int(height))
+        elif self.data[:8] == png.SIGNATURE:
+            self.size, self.pixels, text = png.decode(self.data)
+            self.data = None
+        elif self.data[:6] in (b"GIF87a", b"GIF89a"):
+            self.size = (self.data[6] | self.data[7] << 8, self.data[8] | self.data[9] << 8)
+        else:
+            raise TclError('couldn\'t recognize image data' + (' in image file "' + str(file) + '"' if file else ""))
+
+    def width(self):
+        return self.size[0]
+
+    def height(self):
+        return self.size[1]
+
+    # The image as a bytearray of r,g,b triples, one row after another.
+    def rgb(self):
+        if self.pixels is None:
+            if self.data is not None:
+                self.pixels = gif.decode(self.data, self.size)
+            else:
+                self.pixels = bytearray(3 * self.size[0] * self.size[1])
+        return self.pixels
+
+    def get(self, x, y):
+        at = 3 * (y * self.size[0] + x)
+        return tuple(self.rgb()[at:at + 3])
+
+    # Put a color, or Tk's list of rows of colors, at to=(x, y), or tile
+    # it over the box to=(x1, y1, x2, y2).
+    def put(self, data, to):
+        if data.startswith("{"):
+            rows = data[1:-1].split("} {")
+        else:
+            rows = data.split()
+        rows = [bytes.fromhex(row.replace("#", "")) for row in rows]
+
+        pixels = self.rgb()
+        if len(to) == 4:
+            x1, y1, x2, y2 = to
+        else:
+            x1, y1 = to
+            x2, y2 = x1 + len(rows[0]) // 3, y1 + len(rows)
+        for y in range(y1, y2):
+            row = rows[(y - y1) % len(rows)]
+            span = 3 * (x2 - x1)
+            at = 3 * (y * self.size[0] + x1)
+            pixels[at:at + span] = (row * (span // len(row) + 1))[:span]
+
+    # Get the pixels in a box as r,g,b bytes, one row after another.
+    def region(self, x1, y1, x2, y2):
+        pixels = self.rgb()
+        width = self.size[0]
+        return b"".join(pixels[3 * (y * width + x1):3 * (y * width + x2)] for y in range(y1, y2))
+
+    # Make a new image from a box of this one.
+    def crop(self, x1, y1, x2, y2):
+        part = PhotoImage(width=x2 - x1, height=y2 - y1)
+        part.pixels = bytearray(self.region(x1, y1, x2, y2))
+        return part
+
+    def copy(self):
+        duplicate = PhotoImage(width=self.size[0], height=self.size[1])
+        if self.pixels is None:
+            duplicate.data = self.data
+        else:
+            duplicate.pixels = bytearray(self.pixels)
+        return duplicate
+
+    def write(self, filename, format="GIF"):
+        with open(filename, "wb") as f:
+            f.write(gif.encode(self.rgb(), self.size))
+
+# Just enough GIF to read the game art and write it back out.
+class gif:
+    # Get the r,g,b pixels of the first image in a GIF. A mask, if given,
+    # gets 255 for every pixel that isn't transparent.
+    @staticmethod
+    def decode(data, size, mask=None):
+        width, height = size
+        pixels = bytearray(3 * width * height)
+        flags = data[10]
+        at = 13
+        palette = b""
+        if flags & 0x80:
+            length = 3 << ((flags & 7) + 1)
+            palette = data[at:at + length]
+            at += length
+        transparent = None
+
+        while at < len(data):
+            block = data[at]
+            if block == 0x21:
+                if data[at + 1] == 0xF9 and data[at + 3] & 1:
+                    transparent = data[at + 6]
+                at += 2
+                while data[at]:
+                    at += data[at] + 1
+                at += 1
+            elif block == 0x2C:
+                left = data[at + 1] | data[at + 2] << 8
+                top = data[at + 3] | data[at + 4] << 8
+                w = data[at + 5] | data[at + 6] << 8
+                h = data[at + 7] | data[at + 8] << 8
+                local = data[at + 9]
+                at += 10
+                colors = palette
+                if local & 0x80:
+                    length = 3 << ((local & 7) + 1)
+                    colors = data[at:at + length]
+                    at += length
+                minimum = data[at]
+                at += 1
+                stream = bytearray()
+                while data[at]:
+                    stream += data[at + 1:at + 1 + data[at]]
+                    at += data[at] + 1
+                indices = gif.unpack(stream, minimum, w * h)
+
+                rows = list(range(h))
+                if local & 0x40:
+                    rows = list(range(0, h, 8)) + list(range(4, h, 8)) + list(range(2, h, 4)) + list(range(1, h, 2))
+                for i, row in enumerate(rows):
+                    y = top + row
+                    if y >= height:
+                        continue
+                    for column in range(w):
+                        x = left + column
+                        index = indices[i * w + column]
+                        if x < width and index != transparent:
+                            out = 3 * (y * width + x)
+                            pixels[out:out + 3] = colors[3 * index:3 * index + 3]
+                            if mask is not None:
+                                mask[y * width + x] = 255
+                return pixels
+            else:
+                break
+        return pixels
+
+    # Undo the LZW compression of one image's data.
+    @staticmethod
+    def unpack(stream, minimum, count):
+        clear = 1 << minimum
+        end = clear + 1
+        indices = bytearray()
+        table = [bytes([i]) for i in range(clear)] + [b"", b""]
+        width = minimum + 1
+        bits = 0
+        buffered = 0
+        previous = None
+        for byte in stream:
+            buffered |= byte << bits
+            bits += 8
+            while bits >= width:
+                code = buffered & ((1 << width) - 1)
+                buffered >>= width
+                bits -= width
+                if code == clear:
+                    table = table[:clear + 2]
+                    width = minimum + 1
+                    previous = None
+                    continue
+                if code == end:
+                    return indices[:count]
+                if code < len(table):
+                    entry = table[code]
+                    if previous is not None:
+                        table.append(previous + entry[:1])
+                elif previous is not None:
+                    entry = previous + previous[:1]
+                    table.append(entry)
+                else:
+                    return indices[:count]
+                indices += entry
+                previous = entry
+                if len(table) == 1 << width and width < 12:
+                    width += 1
+        return indices[:count]
+
+    # Write pixels as a GIF without compressing them: every code is a
+    # literal, with a clear code often enough that codes stay 9 bits.
+    @staticmethod
+    def encode(pixels, size):
+        width, height = size
+        palette = {}
+        indices = bytearray()
+        for at in range(0, len(pixels), 3):
+            color = bytes(pixels[at:at + 3])
+            index = palette.get(color)
+            if index is None:
+                if len(palette) == 256:
+                    raise TclError("too many colors for a GIF")
+                index = palette[color] = len(palette)
+            indices.append(index)
+
+        codes = []
+        for start in range(0, len(indices), 254):
+            codes.append(256)
+            codes.extend(indices[start:start + 254])
+        codes.append(257)
+
+        stream = bytearray()
+        buffered = 0
+        bits = 0
+        for code in codes:
+            buffered |= code << bits
+            bits += 9
+            while bits >= 8:
+                stream.append(buffered & 0xFF)
+                buffered >>= 8
+                bits -= 8
+        if bits:
+            stream.append(buffered & 0xFF)
+
+        out = bytearray(b"GIF89a")
+        out += bytes([width & 0xFF, width >> 8, height & 0xFF, height >> 8, 0xF7, 0, 0])
+        colors = bytearray(768)
+        for color, index in palette.items():
+            colors[3 * index:3 * index + 3] = color
+        out += colors
+        out += bytes([0x2C, 0, 0, 0, 0, width & 0xFF, width >> 8, height & 0xFF, height >> 8, 0, 8])
+        for start in range(0, len(stream), 255):
+            chunk = stream[start:start + 255]
+            out.append(len(chunk))
+            out += chunk
+        out += b"\x00\x3B"
+        return bytes(out)
+
+# Just enough PNG for sprite sheets: 8-bit RGB or RGBA, not interlaced.
+class png:
+    SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+    # Get the size, the r,g,b pixels and the text chunks of a PNG.
+    @staticmethod
+    def decode(data):
+        at = len(png.SIGNATURE)
+        compressed = bytearray()
+        text = {}
+        while at < len(data):
+            length, kind = struct.unpack(">I4s", data[at:at + 8])
+            body = data[at + 8:at + 8 + length]
+            at += 12 + length
+            if kind == b"IHDR":
+                width, height, depth, color, compression, filtering, interlace = struct.unpack(">IIBBBBB", body)
+                if depth != 8 or color not in (2, 6) or interlace:
+                    raise TclError("unsupported PNG format")
+            elif kind == b"IDAT":
+                compressed += body
+            elif kind == b"tEXt":
+                keyword, value = body.split(b"\x00", 1)
+                text[keyword.decode("latin-1")] = value.decode("latin-1")
+            elif kind == b"IEND":
+                break
+
+        channels = 4 if color == 6 else 3
+        stride = channels * width
+        raw = zlib.decompress(bytes(compressed))
+        rows = bytearray(stride * height)
+        previous = bytearray(stride)
+        for y in range(height):
+            start = y * (stride + 1)
+            row = png.unfilter(raw[start], bytearray(raw[start + 1:start + 1 + stride]), previous, channels)
+            rows[y * stride:(y + 1) * stride] = row
+            previous = row
+
+        if channels == 3:
+            return (width, height), rows, text
+        pixels = bytearray(3 * width * height)
+        for i in range(3):
+            pixels[i::3] = rows[i::4]
+        return (width, height), pixels, text
+
+    # Undo one row's filter.
+    @staticmethod
+    def unfilter(kind, row, previous, step):
+        if kind == 1:
+            for i in range(step, len(row)):
+                row[i] = (row[i] + row[i - step]) & 0xFF
+        elif kind == 2:
+            for i in range(len(row)):
+                row[i] = (row[i] + previous[i]) & 0xFF
+        elif kind == 3:
+            for i in range(len(row)):
+                left = row[i - step] if i >= step else 0
+                row[i] = (row[i] + ((left + previous[i]) >> 1)) & 0xFF
+        elif kind == 4:
+            for i in range(len(row)):
+                a = row[i - step] if i >= step else 0
+                b = previous[i]
+                c = previous[i - step] if i >= step else 0
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                if pa <= pb and pa <= pc:
+                    predicted = a
+                elif pb <= pc:
+                    predicted = b
+                else:
+                    predicted = c
+                row[i] = (row[i] + predicted) & 0xFF
+        return row
+
+    # Get just the text chunks of a PNG, without decoding its pixels.
+    @staticmethod
+    def text(data):
+        if data[:8] != png.SIGNATURE:
+            raise TclError("not a PNG")
+        at = len(png.SIGNATURE)
+        found = {}
+        while at < len(data):
+            length, kind = struct.unpack(">I4s", data[at:at + 8])
+            if kind == b"tEXt":
+                keyword, value = data[at + 8:at + 8 + length].split(b"\x00", 1)
+                found[keyword.decode("latin-1")] = value.decode("latin-1")
+            elif kind in (b"IDAT", b"IEND"):
+                break
+            at += 12 + length
+        return found
+
+    # Write r,g,b,a pixels as a PNG, with some text chunks.
+    @staticmethod
+    def encode(pixels, size, text=None):
+        width, height = size
+        stride = 4 * width
+        raw = bytearray()
+        for y in range(height):
+            raw.append(0)
+            raw += pixels[y * stride:(y + 1) * stride]
+
+        def chunk(kind, body):
+            return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+        out = bytearray(png.SIGNATURE)
+        out += chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        for keyword, value in (text or {}).items():
+            out += chunk(b"tEXt", keyword.encode("latin-1") + b"\x00" + value.encode("latin-1"))
+        out += chunk(b"IDAT", zlib.compress(bytes(raw), 9))
+        out += chunk(b"IEND", b"")
+        return bytes(out)
@@ -3,24 +3,55 @@
 # Documentation: http://myslu.stlawu.edu/~ltorrey/intrographics
 #########################################################################
 
-import tkinter
 import traceback
+import time
+import json
+import bisect
+import heapq
+import math
+import weakref
+import base64
 import inspect
+import os
+import collections
+import headless
+
+try:
+    import tkinter
+except ImportError:
+    tkinter = None
 
 # Window manager
 class system:
+    palette = 1024  # Most colors remembered by hex()
+
     def __init__(self):
         self.root = None
         self.toplevels = []
+        self.colors = {}
+        self.toolkit = tkinter
+        if tkinter is None or os.environ.get("INTROGRAPHICS_BACKEND") == "headless":
+            self.toolkit = headless
+
+    # Choose between drawing with tkinter and running headless.
+    def backend(self, name):
+        if self.root:
+            return system.error("The backend has to be chosen before any window is created.")
+        if name == "tk" and tkinter is not None:
+            self.toolkit = tkinter
+        elif name == "headless":
+            self.toolkit = headless
+        else:
+            return system.invalid("backend", name)
 
     # Create a tkinter frame.
     def create(self, win):
         if not self.root:
-            self.root = tkinter.Tk()
+            self.root = self.toolkit.Tk()
             self.root.withdraw()
             return self.root
         else:
-            frame = tkinter.Toplevel(self.root)
+            frame = self.toolkit.Toplevel(self.root)
             self.toplevels.append(win)
             frame.withdraw()
             return frame
@@ -40,18 +71,59 @@ class system:
             self.toplevels = []
             self.root.quit()
             self.root = None
+            images.invalidate()
         else:
             self.toplevels.remove(win)
             win.frame.destroy()
 
-    # Convert a color from string or (r,g,b) to hex.
+    # Milliseconds on the clock timers run by. The headless clock only
+    # moves when the script steps it.
+    def clock(self):
+        if self.toolkit is headless and self.root:
+            return self.root.time
+        return time.perf_counter() * 1000
+
+    # Let time pass, then handle any events and timers that are due.
+    def step(self, milliseconds):
+        if self.root:
+            if milliseconds > 0:
+                self.root.after(milliseconds)
+            self.root.update()
+
+    # Convert a color from string or (r,g,b) to hex. Only color names
+    # need Tk, and every answer is remembered.
     def hex(self, color):
         try:
-            if not system.rgb(color):
-                color = tuple(map(lambda x: x // 256, self.root.winfo_rgb(color)))
-            return "#%02x%02x%02x" % color
+            return self.colors[color]
+        except (KeyError, TypeError):
+            pass
+
+        try:
+            if system.rgb(color):
+                found = "#%02x%02x%02x" % color
+            else:
+                found = system.hexcode(color)
+                if found is None:
+                    found = "#%02x%02x%02x" % tuple(map(lambda x: x // 256, self.root.winfo_rgb(color)))
         except:
-            system.invalid("color", color)
+            return system.invalid("color", color)
+
+        if len(self.colors) >= system.palette:
+            del self.colors[next(iter(self.colors))]
+        self.colors[color] = found
+        return found
+
+    # Normalize a "#rgb" or "#rrggbb" color, or return None for anything else.
+    @staticmethod
+    def hexcode(color):
+        if type(color) != str or len(color) not in (4, 7) or color[0] != "#":
+            return None
+        digits = color[1:].lower()
+        if digits.strip("0123456789abcdef"):
+            return None
+        if len(digits) == 3:
+            digits = "".join(c + "0" for c in digits)  # Tk reads #3a7 as #30a070, not #33aa77
+        return "#" + digits
 
     # Check for a valid RBG color.
     @staticmethod
@@ -85,12 +157,472 @@ class system:
     def error(message):
         print("An error occurred here:")
         for location in reversed(traceback.format_stack()):
-            if "intrographics.py" not in location and "tkinter.py" not in location:
+            if "intrographics.py" not in location and "tkinter" not in location and "headless.py" not in location:
                 print(location, message)
                 quit()
 
 sys = system()  # Singleton
 
+def backend(name=None, *extra):
+    """Choose "tk" or "headless" graphics before creating a window."""
+    command = "intrographics.backend(name)"
+
+    # Argument existence
+    if len(extra) > 0:
+        return system.extra(command)
+    if name is None:
+        return system.missing(command)
+
+    sys.backend(name)
+
+# Decoded images shared by every image shape drawn from the same file
+class imagecache:
+    def __init__(self, size=32):
+        self.size = size
+        self.images = collections.OrderedDict()
+        self.sprites = {}
+
+    # Get the image for a sprite name or a file and its (width, height),
+    # decoding a file only if it isn't cached.
+    def load(self, master, filename):
+        sprite = self.sprites.get(filename)
+        if sprite is not None:
+            return sprite
+        key = os.path.abspath(filename)
+        entry = self.images.get(key)
+        if entry is None:
+            img = sys.toolkit.PhotoImage(master=master, file=filename)
+            entry = self.images[key] = (img, (img.width(), img.height()))
+            if len(self.images) > self.size:
+                self.images.popitem(last=False)
+        else:
+            self.images.move_to_end(key)
+        return entry
+
+    # Read a sprite sheet and cut out each of its sprites. The sheet is
+    # a PNG whose "sprites" text chunk maps names to x, y, width, height.
+    def sheet(self, master, filename):
+        with open(filename, "rb") as f:
+            data = f.read()
+        index = json.loads(headless.png.text(data)["sprites"])
+        if sys.toolkit is headless:
+            whole = headless.PhotoImage(master=master, data=data)
+        else:
+            whole = sys.toolkit.PhotoImage(master=master, data=base64.b64encode(data).decode("ascii"), format="png")
+
+        for name, (x, y, width, height) in index.items():
+            if sys.toolkit is headless:
+                img = whole.crop(x, y, x + width, y + height)
+            else:
+                img = sys.toolkit.PhotoImage(master=master, width=width, height=height)
+                img.tk.call(img.name, "copy", whole.name, "-from", x, y, x + width, y + height, "-to", 0, 0)
+            self.sprites[name] = (img, (width, height))
+        return sorted(index)
+
+    # Forget one cached file, or all of them and every sprite.
+    def invalidate(self, filename=None):
+        if filename is None:
+            self.images.clear()
+            self.sprites.clear()
+        else:
+            self.images.pop(os.path.abspath(filename), None)
+
+images = imagecache()  # Singleton
+
+# Positional parameter names of handler functions, found once per function
+class signaturecache:
+    def __init__(self):
+        self.cache = weakref.WeakKeyDictionary()
+
+    # Get the names, or None for a callable that can't be inspected.
+    def names(self, function):
+        key = getattr(function, "__func__", function)
+        try:
+            found = self.cache.get(key)
+        except TypeError:
+            found = key = None  # Can't be weakly referenced, so don't cache
+        if found is None:
+            try:
+                parameters = inspect.signature(getattr(function, "__func__", function)).parameters.values()
+            except (TypeError, ValueError):
+                return None
+            found = tuple(p.name for p in parameters if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+            if key is not None:
+                self.cache[key] = found
+        if hasattr(function, "__func__"):
+            return found[1:]  # A bound method gets self for free
+        return found
+
+signatures = signaturecache()  # Singleton
+
+# Handler functions in the order they were added. Adding and removing
+# are O(1), and adding a function twice keeps only the first.
+class registry:
+    def __init__(self):
+        self.functions = {}
+        self.order = ()
+
+    def __contains__(self, function):
+        return function in self.functions
+
+    def __len__(self):
+        return len(self.functions)
+
+    # Go through the handlers as they were when iteration started, leaving
+    # out any removed along the way.
+    def __iter__(self):
+        if self.order is None:
+            self.order = tuple(self.functions)
+        for function in self.order:
+            if function in self.functions:
+                yield function
+
+    def add(self, function):
+        if function not in self.functions:
+            self.functions[function] = True
+            self.order = None
+
+    def discard(self, function):
+        if self.functions.pop(function, None):
+            self.order = None
+
+    def clear(self):
+        self.functions.clear()
+        self.order = ()
+
+# Canvas changes held back until the end of a batch
+class canvasbatch:
+    # Canvas methods that answer questions, which need the changes made first
+    queries = ("bbox", "find_overlapping", "itemcget")
+
+    def __init__(self, win):
+        self.window = win
+        self.depth = 0
+        self.pending = {}
+        self.deleted = []
+        self.saved = {}
+        self.real = {}
+
+        # What the canvas methods are swapped for during a batch
+        self.overrides = {"coords": self.coords, "itemconfig": self.itemconfig,
+                          "itemconfigure": self.itemconfig, "delete": self.delete}
+        for name in canvasbatch.queries:
+            self.overrides[name] = self.query(name)
+
+    def __enter__(self):
+        if self.depth == 0:
+            self.start()
+        self.depth += 1
+        return self.window
+
+    def __exit__(self, *error):
+        self.depth -= 1
+        if self.depth == 0:
+            self.finish()
+
+    # Send the canvas methods through the batch.
+    def start(self):
+        canvas = self.window.canvas
+        for name, method in self.overrides.items():
+            self.saved[name] = canvas.__dict__.get(name)
+            self.real[name] = getattr(canvas, name)
+            setattr(canvas, name, method)
+
+    # Remember the latest location of an item.
+    def coords(self, identifier, *coords):
+        if not coords:
+            self.flush()
+            return self.real["coords"](identifier)
+        self.pending[(identifier, "coords")] = coords
+
+    # Remember the latest options of an item.
+    def itemconfig(self, identifier, **options):
+        if not options:
+            self.flush()
+            return self.real["itemconfig"](identifier)
+        self.pending.setdefault((identifier, "itemconfig"), {}).update(options)
+
+    # Forget the changes to an item and delete it with the rest.
+    def delete(self, identifier):
+        self.pending.pop((identifier, "coords"), None)
+        self.pending.pop((identifier, "itemconfig"), None)
+        self.deleted.append(identifier)
+
+    # Make the changes so far before answering a question.
+    def query(self, name):
+        def ask(*args, **options):
+            self.flush()
+            return self.real[name](*args, **options)
+        return ask
+
+    # Change the method a canvas gets back at the end of the batch, or
+    # with None, leave it the canvas class's own.
+    def underneath(self, name, method):
+        canvas = self.window.canvas
+        self.saved[name] = method
+        self.real[name] = method if method is not None else getattr(type(canvas), name).__get__(canvas)
+
+    # Make the changes so far.
+    def flush(self):
+        for (identifier, change), arguments in self.pending.items():
+            if change == "coords":
+                self.real["coords"](identifier, *arguments)
+            else:
+                self.real["itemconfig"](identifier, **arguments)
+        self.pending.clear()
+        if self.deleted:
+            self.real["delete"](*self.deleted)
+            self.deleted = []
+
+    # Make the changes, put the canvas methods back and redraw once.
+    def finish(self):
+        canvas = self.window.canvas
+        if self.window.closed:
+            self.pending.clear()
+            self.deleted = []
+        else:
+            self.flush()
+        for name, previous in self.saved.items():
+            if previous is None:
+                canvas.__dict__.pop(name, None)
+            else:
+                setattr(canvas, name, previous)
+        self.saved = {}
+        self.real = {}
+        if not self.window.closed:
+            canvas.update_idletasks()
+
+# Every timer of a window, run from one Tk callback. Timers wait in a
+# heap ordered by when they are due, so adding and cancelling one are
+# O(log n) however many there are. A repeating timer is due again one
+# interval after it was last due, not after it last ran, so lateness
+# doesn't add up; if it falls a whole interval behind, the missed ticks
+# are skipped instead of being run all at once.
+class scheduler:
+    def __init__(self, win):
+        self.window = win
+        self.heap = []
+        self.entries = {}
+        self.order = 0
+        self.cancelled = 0
+        self.pending = None
+        self.armed = None
+
+    def __contains__(self, function):
+        return function in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Run a function once after so many milliseconds, or every so many
+    # milliseconds if it repeats.
+    def add(self, milliseconds, function, repeat=True):
+        if function in self.entries:
+            return
+        self.order += 1
+        entry = [sys.clock() + milliseconds, self.order, function, milliseconds if repeat else None]
+        self.entries[function] = entry
+        heapq.heappush(self.heap, entry)
+        self.arm()
+
+    # Cancelled entries stay in the heap, marked, until they reach the top
+    # or there are enough of them to be worth clearing out.
+    def discard(self, function):
+        entry = self.entries.pop(function, None)
+        if entry is not None:
+            entry[2] = None
+            self.cancelled += 1
+            if self.cancelled > 32 and self.cancelled > len(self.heap) // 2:
+                self.heap[:] = [entry for entry in self.heap if entry[2] is not None]
+                heapq.heapify(self.heap)
+                self.cancelled = 0
+
+    def clear(self):
+        if self.pending is not None:
+            self.window.canvas.after_cancel(self.pending)
+        self.heap = []
+        self.entries.clear()
+        self.cancelled = 0
+        self.pending = self.armed = None
+
+    # Ask Tk to call back when the earliest timer is due, unless it
+    # already will by then.
+    def arm(self):
+        heap = self.heap
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+            self.cancelled -= 1
+        if not heap or self.window.closed:
+            return
+        due = heap[0][0]
+        if self.pending is not None:
+            if self.armed <= due:
+                return
+            self.window.canvas.after_cancel(self.pending)
+        self.armed = due
+        self.pending = self.window.canvas.after(max(0, math.ceil(due - sys.clock())), self.run)
+
+    # Run every timer that is due, then wait for the next one. A timer
+    # that raises still leaves the rest armed, and any others that were
+    # due run on the next callback.
+    def run(self):
+        self.pending = self.armed = None
+        now = sys.clock()
+        heap = self.heap
+        try:
+            while heap and heap[0][0] <= now and not self.window.closed:
+                entry = heapq.heappop(heap)
+                due, order, function, interval = entry
+                if function is None:
+                    self.cancelled -= 1
+                    continue
+                if interval is None:
+                    del self.entries[function]
+                else:
+                    entry[0] = due + interval * (1 + (sys.clock() - due) // interval)
+                    self.order += 1
+                    entry[1] = self.order
+                    heapq.heappush(heap, entry)
+                self.window.tick(function)
+        finally:
+            self.arm()
+
+# Shapes gliding to new locations. One timer moves every shape a frame
+# at a time, all in one batch. Where a shape is depends only on how long
+# it has been moving, so a frame that runs late just jumps further, and
+# the frames it missed are skipped rather than run late.
+class animator:
+    rate = 60  # Frames per second
+
+    def __init__(self, win):
+        self.window = win
+        self.moving = {}
+        self.interval = max(1, round(1000 / animator.rate))
+
+    def __len__(self):
+        return len(self.moving)
+
+    # Start moving a shape, or send it somewhere new from where it is now.
+    def add(self, shape, x, y, milliseconds, easing, function):
+        self.moving[shape] = (sys.clock(), milliseconds, shape.x, shape.y, x, y, easing, function)
+        self.window.timers.add(self.interval, self.frame)
+
+    def discard(self, shape):
+        if self.moving.pop(shape, None) is not None and not self.moving:
+            self.window.timers.discard(self.frame)
+
+    def clear(self):
+        self.moving.clear()
+        self.window.timers.discard(self.frame)
+
+    # Put every moving shape where it should be by now.
+    def frame(self):
+        now = sys.clock()
+        finished = []
+        with self.window.batch():
+            for shape, (start, milliseconds, x1, y1, x2, y2, easing, function) in list(self.moving.items()):
+                done = now - start >= milliseconds
+                along = 1 if done else easing((now - start) / milliseconds)
+                shape.relocate(x1 + (x2 - x1) * along, y1 + (y2 - y1) * along)
+                if done:
+                    del self.moving[shape]
+                    finished.append(function)
+        if not self.moving:
+            self.window.timers.discard(self.frame)
+        for function in finished:
+            if function is not None:
+                function()
+
+# Event handler timings and canvas call counts for one window
+class profiler:
+    # Upper edges of the latency histogram buckets, in milliseconds
+    buckets = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000)
+
+    # Canvas methods that each make one Tk call
+    calls = ("create_image", "create_line", "create_oval", "create_polygon", "create_rectangle",
+             "create_text", "create_window", "coords", "itemconfig", "itemcget", "delete",
+             "bbox", "find_overlapping", "configure", "update", "update_idletasks")
+
+    def __init__(self, filename=None, milliseconds=10000):
+        self.filename = filename
+        self.interval = milliseconds / 1000
+        self.due = time.perf_counter() + self.interval
+        self.handlers = {}
+        self.events = {}
+        self.count = 0
+
+    # Count every Tk call made through a canvas. During a batch, the
+    # methods the batch has swapped out are wrapped underneath it instead.
+    def watch(self, canvas, batch):
+        for name in profiler.calls:
+            if name in batch.saved:
+                batch.underneath(name, self.counted(batch.real[name]))
+            elif hasattr(canvas, name):
+                setattr(canvas, name, self.counted(getattr(canvas, name)))
+
+    def unwatch(self, canvas, batch):
+        for name in profiler.calls:
+            if name in batch.saved:
+                batch.underneath(name, None)
+            else:
+                canvas.__dict__.pop(name, None)
+
+    def counted(self, method):
+        def call(*args, **options):
+            self.count += 1
+            return method(*args, **options)
+        return call
+
+    # Call every handler for an event, timing each one.
+    def dispatch(self, kind, handlers, *args):
+        before = self.count
+        for function in handlers:
+            start = time.perf_counter()
+            function(*args)
+            self.record(kind, function, time.perf_counter() - start)
+        self.event(kind, self.count - before)
+
+    # Add one handler call to the statistics.
+    def record(self, kind, function, seconds):
+        key = (kind, function)
+        entry = self.handlers.get(key)
+        if entry is None:
+            entry = self.handlers[key] = [0, 0.0, 0.0, [0] * (len(profiler.buckets) + 1)]
+        milliseconds = seconds * 1000
+        entry[0] += 1
+        entry[1] += milliseconds
+        entry[2] = max(entry[2], milliseconds)
+        entry[3][bisect.bisect_left(profiler.buckets, milliseconds)] += 1
+
+    # Add one event and the Tk calls its handlers made.
+    def event(self, kind, calls):
+        entry = self.events.setdefault(kind, [0, 0, 0])
+        entry[0] += 1
+        entry[1] += calls
+        entry[2] = max(entry[2], calls)
+        if self.filename is not None and time.perf_counter() >= self.due:
+            self.dump()
+
+    # Get the statistics so far as a dictionary.
+    def summary(self):
+        labels = ["<= " + str(edge) + " ms" for edge in profiler.buckets] + ["> " + str(profiler.buckets[-1]) + " ms"]
+        handlers = {}
+        for (kind, function), (calls, total, longest, histogram) in self.handlers.items():
+            name = kind + " " + getattr(function, "__name__", repr(function))
+            handlers[name] = {"calls": calls, "total ms": total, "mean ms": total / calls, "max ms": longest,
+                              "histogram": dict(zip(labels, histogram))}
+        events = {}
+        for kind, (count, calls, most) in self.events.items():
+            events[kind] = {"events": count, "tk calls": calls, "tk calls per event": calls / count,
+                            "max tk calls": most}
+        return {"handlers": handlers, "events": events}
+
+    # Write the statistics to the stats file.
+    def dump(self):
+        self.due = time.perf_counter() + self.interval
+        with open(self.filename, "w") as f:
+            json.dump(self.summary(), f, indent=2, sort_keys=True)
+
 class window:
     """Simple graphical display."""
 
@@ -121,19 +653,26 @@ class window:
         # Custom setup
         self.x = 0
         self.y = 0
-        self.shapes = []
-        self.timers = []
+        self.shapes = {}
+        self.groups = {}
+        self.unsorted = set()
+        self.created = 0
+        self.timers = scheduler(self)
+        self.animations = animator(self)
         self.opened = False
         self.closed = False
-        self.keyPressHandlers = []
-        self.leftClickHandlers = []
-        self.leftDragHandlers = []
-        self.rightClickHandlers = []
-        self.rightDragHandlers = []
+        self.keyPressHandlers = registry()
+        self.leftClickHandlers = registry()
+        self.leftDragHandlers = registry()
+        self.rightClickHandlers = registry()
+        self.rightDragHandlers = registry()
+        self.profiler = None
+        self.profiling = False
 
         # Tkinter setup
         self.frame = sys.create(self)
-        self.canvas = tkinter.Canvas(self.frame)
+        self.canvas = sys.toolkit.Canvas(self.frame)
+        self.batching = canvasbatch(self)
         self.configure(self.x, self.y, width, height)
         self.fill("white")
 
@@ -243,8 +782,7 @@ class window:
 
         if not self.closed:
             shape = rectangle(self.canvas, x, y, width, height)
-            self.shapes.append(shape)
-            return shape
+            return self.track(shape)
 
     def oval(self, x=None, y=None, width=None, height=None, *extra):
         """Draw and return an oval shape."""
@@ -273,8 +811,7 @@ class window:
 
         if not self.closed:
             shape = oval(self.canvas, x, y, width, height)
-            self.shapes.append(shape)
-            return shape
+            return self.track(shape)
 
     def polygon(self, *points):
         """Draw and return a polygon shape."""
@@ -297,8 +834,7 @@ class window:
 
         if not self.closed:
             shape = polygon(self.canvas, tuple(pointlist))
-            self.shapes.append(shape)
-            return shape
+            return self.track(shape)
 
     def line(self, *points):
         """Draw and return a line shape."""
@@ -321,8 +857,7 @@ class window:
 
         if not self.closed:
             shape = line(self.canvas, tuple(pointlist))
-            self.shapes.append(shape)
-            return shape
+            return self.track(shape)
 
     def text(self, x=None, y=None, message=None, *extra):
         """Draw and return a text shape."""
@@ -343,8 +878,7 @@ class window:
 
         if not self.closed:
             shape = text(self.canvas, x, y, str(message))
-            self.shapes.append(shape)
-            return shape
+            return self.track(shape)
 
     def button(self, x=None, y=None, message=None, *extra):
         """Draw and return a button shape."""
@@ -365,8 +899,7 @@ class window:
 
         if not self.closed:
             shape = button(self.canvas, x, y, str(message))
-            self.shapes.append(shape)
-            return shape
+            return self.track(shape)
 
     def field(self, x=None, y=None, message="", *extra):
         """Draw and return a field shape."""
@@ -387,11 +920,10 @@ class window:
 
         if not self.closed:
             shape = field(self.canvas, x, y, str(message))
-            self.shapes.append(shape)
-            return shape
+            return self.track(shape)
 
     def image(self, x=None, y=None, filename=None, *extra):
-        """Draw and return an image shape."""
+        """Draw and return an image shape from a GIF file or a loaded sprite."""
         command = "window.image(x,y,filename)"
 
         # Argument existence
@@ -409,8 +941,52 @@ class window:
 
         if not self.closed:
             shape = image(self.canvas, x, y, str(filename))
-            self.shapes.append(shape)
-            return shape
+            return self.track(shape)
+
+    def sprites(self, filename=None, *extra):
+        """Load a sprite sheet, so that image() can draw its sprites by name."""
+        command = "window.sprites(filename)"
+
+        # Argument existence
+        if len(extra) > 0:
+            return system.extra(command)
+        if filename is None:
+            return system.missing(command)
+
+        if not self.closed:
+            try:
+                return images.sheet(self.canvas.master, str(filename))
+            except (OSError, KeyError, ValueError, sys.toolkit.TclError):
+                return system.invalid("sprite sheet", filename)
+
+    def batch(self):
+        """Hold back drawing in a with block and draw it all at the end."""
+        return self.batching
+
+    # Keep track of a newly drawn shape.
+    def track(self, shape):
+        shape.window = self
+        shape.order = self.created
+        self.created += 1
+        self.shapes[shape] = None
+        return shape
+
+    # Add a shape to the index of a named group.
+    def join(self, shape, name):
+        members = self.groups.setdefault(name, {})
+        if shape not in members:
+            if members and shape.order < next(reversed(members)).order:
+                self.unsorted.add(name)
+            members[shape] = None
+
+    # Take a shape out of the index of a named group.
+    def leave(self, shape, name):
+        members = self.groups.get(name)
+        if members is not None and shape in members:
+            del members[shape]
+            if not members:
+                del self.groups[name]
+                self.unsorted.discard(name)
 
     def all(self, group=None, *extra):
         """Get a list of shapes in the window."""
@@ -420,11 +996,19 @@ class window:
         if len(extra) > 0:
             return system.extra(command)
 
-        shapes = []
-        for shape in self.shapes:
-            if group is None or group in shape.groups:
-                shapes.append(shape)
-        return shapes
+        if group is None:
+            return list(self.shapes)
+
+        members = self.groups.get(group)
+        if members is None:
+            return []
+
+        # Groups joined out of creation order get sorted once, when asked for
+        if group in self.unsorted:
+            self.unsorted.remove(group)
+            members = dict.fromkeys(sorted(members, key=lambda shape: shape.order))
+            self.groups[group] = members
+        return list(members)
 
     def remove(self, shape=None):
         """Remove a shape from the window."""
@@ -437,12 +1021,36 @@ class window:
             return system.invalid("shape", shape)
 
         if not self.closed and shape in self.shapes:
-            self.shapes.remove(shape)
+            del self.shapes[shape]
+            for name in shape.groups:
+                self.leave(shape, name)
+            self.animations.discard(shape)
             shape.delete()
 
-    def onTimer(self, milliseconds=None, function=None, *extra):
-        """Assign a function to handle timer ticks."""
-        command = "window.onTimer(milliseconds,function)"
+    def removeAll(self, group=None, *extra):
+        """Remove every shape in a named group from the window."""
+        command = "window.removeAll(group)"
+
+        # Argument existence
+        if len(extra) > 0:
+            return system.extra(command)
+        if group is None:
+            return system.missing(command)
+
+        if not self.closed and group in self.groups:
+            members = self.groups.pop(group)
+            self.unsorted.discard(group)
+            for shape in members:
+                del self.shapes[shape]
+                for name in shape.groups:
+                    if name != group:
+                        self.leave(shape, name)
+                self.animations.discard(shape)
+                shape.delete()
+
+    def onTimer(self, milliseconds=None, function=None, repeat=True, *extra):
+        """Assign a function to handle timer ticks, or to run once if repeat is False."""
+        command = "window.onTimer(milliseconds,function,repeat?)"
 
         # Argument existence
         if len(extra) > 0:
@@ -460,19 +1068,16 @@ class window:
 
         if not hasattr(function, "__call__"):
             return system.invalid("timer function", function)
-        if len(inspect.getargspec(function)[0]) > 0:
+        if signatures.names(function) != ():
             return sys.error("Timer function '" + function.__name__ + "' should expect no arguments.")
 
-        if not self.closed and function not in self.timers:
-            self.timers.append(function)
-            self.canvas.after(milliseconds, self.tick, milliseconds, function)
+        if not self.closed:
+            self.timers.add(milliseconds, function, bool(repeat))
 
-    # Call a function periodically.
-    def tick(self, milliseconds, function):
-        if not self.closed and function in self.timers:
-            if self.opened:
-                function()
-            self.canvas.after(milliseconds, self.tick, milliseconds, function)
+    # Call a timer function that has come due.
+    def tick(self, function):
+        if self.opened:
+            function()
 
     def offTimer(self, function=None, *extra):
         """Unassign a timer function."""
@@ -487,11 +1092,48 @@ class window:
         # Argument types
         if not hasattr(function, "__call__"):
             return system.invalid("timer function", function)
-        if len(inspect.getargspec(function)[0]) > 0:
+        if signatures.names(function) != ():
             return system.invalid("timer function", function.__name__)
 
-        if function in self.timers:
-            self.timers.remove(function)
+        self.timers.discard(function)
+
+    def animate(self, shape=None, x=None, y=None, milliseconds=None, easing=None, function=None, *extra):
+        """Move a shape smoothly to a new location, then call a function if given."""
+        command = "window.animate(shape,x,y,milliseconds,easing?,function?)"
+
+        # Argument existence
+        if len(extra) > 0:
+            return system.extra(command)
+        if shape is None or x is None or y is None or milliseconds is None:
+            return system.missing(command)
+
+        # Argument types
+        if not isinstance(shape, (boxshape, pointshape)):
+            return system.invalid("shape", shape)
+        try:
+            x = int(x)
+            y = int(y)
+        except ValueError:
+            return system.invalid("new location", (x,y))
+        try:
+            milliseconds = int(milliseconds)
+            if milliseconds < 0:
+                raise ValueError
+        except ValueError:
+            return system.invalid("animation time", milliseconds)
+
+        if easing is None:
+            easing = lambda along: along
+        elif not hasattr(easing, "__call__") or signatures.names(easing) is None or len(signatures.names(easing)) != 1:
+            return system.invalid("easing function", easing)
+        if function is not None:
+            if not hasattr(function, "__call__"):
+                return system.invalid("animation function", function)
+            if signatures.names(function) != ():
+                return sys.error("Animation function '" + function.__name__ + "' should expect no arguments.")
+
+        if not self.closed and shape in self.shapes:
+            self.animations.add(shape, x, y, milliseconds, easing, function)
 
     def onKeyPress(self, function=None, *extra):
         """Assign a function to handle key presses."""
@@ -506,11 +1148,11 @@ class window:
         # Argument types
         if not hasattr(function, "__call__"):
             return system.invalid("key function", function)
-        if inspect.getargspec(function)[0] != ["key"]:
+        if signatures.names(function) != ("key",):
             return sys.error("Key function '" + function.__name__ + "' should expect one argument (key).")
 
-        if not self.closed and function not in self.keyPressHandlers:
-            self.keyPressHandlers.append(function)
+        if not self.closed:
+            self.keyPressHandlers.add(function)
 
     def offKeyPress(self, function=None, *extra):
         """Unassign a key-press function."""
@@ -525,11 +1167,10 @@ class window:
         # Argument types
         if not hasattr(function, "__call__"):
             return system.invalid("key function", function)
-        if inspect.getargspec(function)[0] != ["key"]:
+        if signatures.names(function) != ("key",):
             return system.invalid("key function", function.__name__)
 
-        if function in self.keyPressHandlers:
-            self.keyPressHandlers.remove(function)
+        self.keyPressHandlers.discard(function)
 
     def onLeftClick(self, function=None, *extra):
         """Assign a function to handle left clicks."""
@@ -544,11 +1185,11 @@ class window:
         # Argument types
         if not hasattr(function, "__call__"):
             return system.invalid("click function", function)
-        if inspect.getargspec(function)[0] != ["x","y"]:
+        if signatures.names(function) != ("x", "y"):
             return sys.error("Click function '" + function.__name__ + "' should expect two arguments (x,y).")
 
-        if not self.closed and function not in self.leftClickHandlers:
-            self.leftClickHandlers.append(function)
+        if not self.closed:
+            self.leftClickHandlers.add(function)
 
     def offLeftClick(self, function=None, *extra):
         """Unassign a left-click function."""
@@ -563,11 +1204,10 @@ class window:
         # Argument types
         if not hasattr(function, "__call__"):
             return system.invalid("click function", function)
-        if inspect.getargspec(function)[0] != ["x","y"]:
+        if signatures.names(function) != ("x", "y"):
             return system.invalid("click function", function.__name__)
 
-        if function in self.leftClickHandlers:
-            self.leftClickHandlers.remove(function)
+        self.leftClickHandlers.discard(function)
 
     def onLeftDrag(self, function=None, *extra):
         """Assign a function to handle left drags."""
@@ -582,11 +1222,11 @@ class window:
         # Argument types
         if not hasattr(function, "__call__"):
             return system.invalid("drag function", function)
-        if inspect.getargspec(function)[0] != ["x","y"]:
+        if signatures.names(function) != ("x", "y"):
             return sys.error("Drag function '" + function.__name__ + "' should expect two arguments (x,y).")
 
-        if not self.closed and function not in self.leftDragHandlers:
-            self.leftDragHandlers.append(function)
+        if not self.closed:
+            self.leftDragHandlers.add(function)
 
     def offLeftDrag(self, function=None, *extra):
         """Unassign a left-drag function."""
@@ -601,11 +1241,10 @@ class window:
         # Argument types
         if not hasattr(function, "__call__"):
             return system.invalid("drag function", function)
-        if inspect.getargspec(function)[0] != ["x","y"]:
+        if signatures.names(function) != ("x", "y"):
             return system.invalid("drag function", function.__name__)
 
-        if function in self.leftDragHandlers:
-            self.leftDragHandlers.remove(function)
+        self.leftDragHandlers.discard(function)
 
     def onRightClick(self, function=None, *extra):
         """Assign a function to handle right clicks."""
@@ -620,11 +1259,11 @@ class window:
         # Argument types
         if not hasattr(function, "__call__"):
             return system.invalid("click function", function)
-        if inspect.getargspec(function)[0] != ["x","y"]:
+        if signatures.names(function) != ("x", "y"):
             return sys.error("Click function '" + function.__name__ + "' should expect two arguments (x,y).")
 
-        if not self.closed and function not in self.rightClickHandlers:
-            self.rightClickHandlers.append(function)
+        if not self.closed:
+            self.rightClickHandlers.add(function)
 
     def offRightClick(self, function=None, *extra):
         """Unassign a right-click function."""
@@ -639,11 +1278,10 @@ class window:
         # Argument types
         if not hasattr(function, "__call__"):
             return system.invalid("click function", function)
-        if inspect.getargspec(function)[0] != ["x","y"]:
+        if signatures.names(function) != ("x", "y"):
             return system.invalid("click function", function.__name__)
 
-        if function in self.rightClickHandlers:
-            self.rightClickHandlers.remove(function)
+        self.rightClickHandlers.discard(function)
 
     def onRightDrag(self, function=None, *extra):
         """Assign a function to handle right drags."""
@@ -658,11 +1296,11 @@ class window:
         # Argument types
         if not hasattr(function, "__call__"):
             return system.invalid("drag function", function)
-        if inspect.getargspec(function)[0] != ["x","y"]:
+        if signatures.names(function) != ("x", "y"):
             return sys.error("Drag function '" + function.__name__ + "' should expect two arguments (x,y).")
 
-        if not self.closed and function not in self.rightDragHandlers:
-            self.rightDragHandlers.append(function)
+        if not self.closed:
+            self.rightDragHandlers.add(function)
 
     def offRightDrag(self, function=None, *extra):
         """Unassign a right-drag function."""
@@ -677,11 +1315,10 @@ class window:
         # Argument types
         if not hasattr(function, "__call__"):
             return system.invalid("drag function", function)
-        if inspect.getargspec(function)[0] != ["x","y"]:
+        if signatures.names(function) != ("x", "y"):
             return system.invalid("drag function", function.__name__)
 
-        if function in self.rightDragHandlers:
-            self.rightDragHandlers.remove(function)
+        self.rightDragHandlers.discard(function)
 
     def keyPress(self, event):
         for function in self.keyPressHandlers:
@@ -703,6 +1340,109 @@ class window:
         for function in self.rightDragHandlers:
             function(event.x, event.y)
 
+    # Dispatch a timer tick while profiling.
+    def profiledTick(self, function):
+        if self.opened:
+            self.profiler.dispatch("timer", (function,))
+
+    def profile(self, filename=None, milliseconds=10000, *extra):
+        """Start timing event handlers and counting the Tk calls they make."""
+        command = "window.profile(filename?,milliseconds?)"
+
+        # Argument existence
+        if len(extra) > 0:
+            return system.extra(command)
+
+        # Argument types
+        try:
+            milliseconds = int(milliseconds)
+            if milliseconds < 1:
+                raise ValueError
+        except ValueError:
+            return system.invalid("stats interval", milliseconds)
+
+        if not self.profiling and not self.closed:
+            self.profiler = profiler(filename, milliseconds)
+            self.profiler.watch(self.canvas, self.batching)
+            self.profiling = True
+
+            # Instance attributes take over from the plain dispatchers, so
+            # nothing is timed or counted until now.
+            dispatch = self.profiler.dispatch
+            self.keyPress = lambda event: dispatch("keyPress", self.keyPressHandlers, event.keysym)
+            self.leftClick = lambda event: dispatch("leftClick", self.leftClickHandlers, event.x, event.y)
+            self.leftDrag = lambda event: dispatch("leftDrag", self.leftDragHandlers, event.x, event.y)
+            self.rightClick = lambda event: dispatch("rightClick", self.rightClickHandlers, event.x, event.y)
+            self.rightDrag = lambda event: dispatch("rightDrag", self.rightDragHandlers, event.x, event.y)
+            self.tick = self.profiledTick
+
+    def unprofile(self):
+        """Stop timing event handlers, writing the stats file one last time."""
+        if self.profiling:
+            for name in ("keyPress", "leftClick", "leftDrag", "rightClick", "rightDrag", "tick"):
+                del self.__dict__[name]
+            self.profiler.unwatch(self.canvas, self.batching)
+            self.profiling = False
+            if self.profiler.filename is not None:
+                self.profiler.dump()
+
+    def statistics(self):
+        """Get the handler timings and Tk call counts from profiling."""
+        if self.profiler is None:
+            return None
+        return self.profiler.summary()
+
+    def press(self, *keys):
+        """Type keys into the window, as if a person pressed them."""
+        command = "window.press(key, ...)"
+
+        # Argument existence
+        if len(keys) < 1:
+            return system.missing(command)
+
+        if not self.closed:
+            for key in keys:
+                self.frame.event_generate("<KeyPress>", keysym=str(key), when="tail")
+
+    def click(self, x=None, y=None, *extra):
+        """Left-click the window at a point, as if a person did."""
+        command = "window.click(x,y)"
+
+        # Argument existence
+        if len(extra) > 0:
+            return system.extra(command)
+        if x is None or y is None:
+            return system.missing(command)
+
+        # Argument types
+        try:
+            x = int(x)
+            y = int(y)
+        except ValueError:
+            return system.invalid("click location", (x,y))
+
+        if not self.closed:
+            self.frame.event_generate("<Button-1>", x=x, y=y, when="tail")
+
+    def step(self, milliseconds=0, *extra):
+        """Let time pass and handle the events and timers that come due."""
+        command = "window.step(milliseconds?)"
+
+        # Argument existence
+        if len(extra) > 0:
+            return system.extra(command)
+
+        # Argument types
+        try:
+            milliseconds = int(milliseconds)
+            if milliseconds < 0:
+                raise ValueError
+        except ValueError:
+            return system.invalid("step time", milliseconds)
+
+        if not self.closed:
+            sys.step(milliseconds)
+
     def open(self, title="intrographics", *extra):
         """Make the window visible."""
         command = "window.open(title?)"
@@ -726,14 +1466,16 @@ class window:
             return system.extra(command)
 
         if self.opened and not self.closed:
-            for obj in self.shapes[:]:
+            self.unprofile()
+            for obj in list(self.shapes):
                 self.remove(obj)
-            self.timers = []
-            self.keyPressHandlers = []
-            self.leftClickHandlers = []
-            self.leftDragHandlers = []
-            self.rightClickHandlers = []
-            self.rightDragHandlers = []
+            self.animations.clear()
+            self.timers.clear()
+            self.keyPressHandlers.clear()
+            self.leftClickHandlers.clear()
+            self.leftDragHandlers.clear()
+            self.rightClickHandlers.clear()
+            self.rightDragHandlers.clear()
             self.closed = True
             sys.destroy(self)
             print(str(output))
@@ -742,6 +1484,7 @@ class window:
 class windowshape:
     def __init__(self, canvas):
         self.canvas = canvas
+        self.window = None
         self.deleted = False
         self.groups = set()
 
@@ -768,6 +1511,8 @@ class windowshape:
 
         if not self.deleted:
             self.groups.add(name)
+            if self.window is not None:
+                self.window.join(self, name)
 
     def ungroup(self, name=None, *extra):
         """Take this shape out of a named group."""
@@ -781,6 +1526,8 @@ class windowshape:
 
         if name in self.groups:
             self.groups.remove(name)
+            if self.window is not None:
+                self.window.leave(self, name)
 
     def overlaps(self, shape=None, *extra):
         """Check if this shape overlaps another."""
@@ -1043,15 +1790,23 @@ class pointshape(windowshape):
     # Update the shape location.
     def configure(self, x, y):
         self.canvas.coords(self.id, (x, y))
+        self.locate(x, y)
+
+    # Remember where the shape is.
+    def locate(self, x, y):
         self.x = x
         self.y = y
         self.__dict__["left"] = x
         self.__dict__["top"] = y
-        self.__dict__["right"] = self.canvas.bbox(self.id)[2]
-        self.__dict__["bottom"] = self.canvas.bbox(self.id)[3]
+        self.__dict__["right"], self.__dict__["bottom"] = self.corner(x, y)
         self.__dict__["width"] = self.__dict__["right"] - self.__dict__["left"]
         self.__dict__["height"] = self.__dict__["bottom"] - self.__dict__["top"]
 
+    # Find the bottom right corner of the shape.
+    def corner(self, x, y):
+        box = self.canvas.bbox(self.id)
+        return box[2], box[3]
+
     def move(self, dx=None, dy=None, *extra):
         """Move this shape."""
         command = self.__class__.__name__ + ".move(dx,dy)"
@@ -1153,8 +1908,8 @@ class text(pointshape):
 class button(pointshape):
     """A clickable button."""
     def __init__(self, canvas, x, y, message):
-        self.handlers = []
-        self.button = tkinter.Button(canvas.master, text=message)
+        self.handlers = registry()
+        self.button = sys.toolkit.Button(canvas.master, text=message)
         self.button.config(command=self.activate)
         self.id = canvas.create_window(x, y, anchor="nw", window=self.button)
         super().__init__(canvas, x, y)
@@ -1202,11 +1957,12 @@ class button(pointshape):
         # Argument types
         if not hasattr(function, "__call__"):
             return system.invalid("button function", function)
-        if len(inspect.getargspec(function)[0]) > 1:
+        names = signatures.names(function)
+        if names is None or len(names) > 1:
             return sys.error("Button function '" + function.__name__ + "' should expect  no arguments or one (source).")
 
-        if not self.deleted and function not in self.handlers:
-            self.handlers.append(function)
+        if not self.deleted:
+            self.handlers.add(function)
 
     def offActivate(self, function=None, *extra):
         """Unassign a function for this button."""
@@ -1221,16 +1977,17 @@ class button(pointshape):
         # Argument types
         if not hasattr(function, "__call__"):
             return system.invalid("button function", function)
-        if len(inspect.getargspec(function)[0]) > 1:
+        names = signatures.names(function)
+        if names is None or len(names) > 1:
             return system.invalid("button function", function.__name__)
 
-        if not self.deleted and function in self.handlers:
-            self.handlers.remove(function)
+        if not self.deleted:
+            self.handlers.discard(function)
 
     # Activate the button.
     def activate(self):
         for function in self.handlers:
-            if len(inspect.getargspec(function)[0]) > 0:
+            if len(signatures.names(function)) > 0:
                 function(self)
             else:
                 function()
@@ -1238,8 +1995,8 @@ class button(pointshape):
 class field(pointshape):
     """An input field."""
     def __init__(self, canvas, x, y, message):
-        self.message = tkinter.StringVar(value=message)
-        self.entry = tkinter.Entry(canvas.master, textvariable=self.message, relief="sunken", background="gray99")
+        self.message = sys.toolkit.StringVar(value=message)
+        self.entry = sys.toolkit.Entry(canvas.master, textvariable=self.message, relief="sunken", background="gray99")
         self.id = canvas.create_window(x, y, anchor="nw", window=self.entry)
         self.entry.bind("<FocusIn>", lambda event: self.message.set(""))
         super().__init__(canvas, x, y)
@@ -1277,9 +2034,22 @@ class field(pointshape):
 class image(pointshape):
     """A GIF image."""
     def __init__(self, canvas, x, y, filename):
-        self.img = tkinter.PhotoImage(master=canvas.master, file=filename)
+        self.img, self.size = images.load(canvas.master, filename)
+        self.shared = True
         self.id = canvas.create_image(x, y, anchor="nw", image=self.img)
-        super().__init__(canvas, x, y)
+        windowshape.__init__(self, canvas)
+        self.locate(x, y)  # Already drawn in place
+
+    # Images keep their size, so there's no need to ask the canvas.
+    def corner(self, x, y):
+        return x + self.size[0], y + self.size[1]
+
+    # Give this shape its own copy of a cached image before changing it.
+    def own(self):
+        if self.shared:
+            self.img = self.img.copy()
+            self.shared = False
+            self.canvas.itemconfig(self.id, image=self.img)
 
     def getColor(self, x=None, y=None, *extra):
         """Retrieve the (r,g,b) color at pixel x,y of the image."""
@@ -1329,8 +2099,92 @@ class image(pointshape):
             return system.invalid("image pixel", (x,y))
 
         if not self.deleted:
+            self.own()
             self.img.put(sys.hex(color), (x,y))
 
+    # Check that a region is inside the image, as ints.
+    def region(self, x, y, width, height):
+        x, y, width, height = int(x), int(y), int(width), int(height)
+        if width < 1 or height < 1 or x < 0 or y < 0:
+            raise ValueError
+        if x + width > self.img.width() or y + height > self.img.height():
+            raise ValueError
+        return x, y, width, height
+
+    def getRegion(self, x=None, y=None, width=None, height=None, *extra):
+        """Retrieve the pixels of a region as bytes of r,g,b, row by row."""
+        command = "image.getRegion(x,y,width,height)"
+
+        # Argument existence
+        if len(extra) > 0:
+            return system.extra(command)
+        if x is None or y is None or width is None or height is None:
+            return system.missing(command)
+
+        # Argument types
+        try:
+            x, y, width, height = self.region(x, y, width, height)
+        except ValueError:
+            return system.invalid("image region", (x,y,width,height))
+
+        if self.deleted:
+            return system.error("Can't get colors from a deleted image.")
+        if isinstance(self.img, headless.PhotoImage):
+            return self.img.region(x, y, x + width, y + height)
+        rows = self.img.tk.splitlist(self.img.tk.call(self.img.name, "data", "-from", x, y, x + width, y + height))
+        return bytes.fromhex(" ".join(rows).replace("#", ""))
+
+    def setRegion(self, x=None, y=None, width=None, height=None, pixels=None, *extra):
+        """Change the pixels of a region to bytes of r,g,b, row by row."""
+        command = "image.setRegion(x,y,width,height,pixels)"
+
+        # Argument existence
+        if len(extra) > 0:
+            return system.extra(command)
+        if x is None or y is None or width is None or height is None or pixels is None:
+            return system.missing(command)
+
+        # Argument types
+        try:
+            x, y, width, height = self.region(x, y, width, height)
+        except ValueError:
+            return system.invalid("image region", (x,y,width,height))
+        try:
+            if hasattr(pixels, "__array_interface__"):
+                import numpy  # Already loaded by whoever made the array
+                pixels = numpy.ascontiguousarray(pixels, dtype=numpy.uint8).tobytes()
+            pixels = bytes(pixels)
+            if len(pixels) != 3 * width * height:
+                raise ValueError
+        except (TypeError, ValueError):
+            return system.invalid("pixel data", type(pixels).__name__)
+
+        if not self.deleted:
+            self.own()
+            span = 3 * width
+            rows = ("{#" + pixels[at:at + span].hex(" ", 3).replace(" ", " #") + "}" for at in range(0, len(pixels), span))
+            self.img.put(" ".join(rows), to=(x, y))
+
+    def fillRegion(self, x=None, y=None, width=None, height=None, color=None, *extra):
+        """Change every pixel of a region to one (r,g,b) color."""
+        command = "image.fillRegion(x,y,width,height,color)"
+
+        # Argument existence
+        if len(extra) > 0:
+            return system.extra(command)
+        if x is None or y is None or width is None or height is None or color is None:
+            return system.missing(command)
+
+        # Argument types
+        try:
+            x, y, width, height = self.region(x, y, width, height)
+        except ValueError:
+            return system.invalid("image region", (x,y,width,height))
+
+        if not self.deleted:
+            self.own()
+            self.img.put(sys.hex(color), to=(x, y, x + width, y + height))
+
     def saveAs(self, filename=None, *extra):
         """Save this image to a file."""
         command = "image.saveAs(filename)"
@@ -0,0 +1,206 @@
+#########################################################################
+# A computer opponent: Monte Carlo tree search with UCT selection.
+#
+# Tree nodes live in parallel preallocated arrays, and a node's
+# children sit next to each other, so a node is an index and the tree
+# never grows past the capacity it was made with. Between moves the
+# part of the tree below the new position is slid to the front of the
+# arrays and searching goes on from there.
+#########################################################################
+
+import time
+import math
+import array
+import random
+import board
+
+# What a node's last move did.
+OPEN = 0
+WON = 1
+DRAWN = 2
+
+# Play out a game at random, except for taking wins and blocking the
+# opponent's. Returns 1, 0.5 or 0 for the player to move.
+def playout(current, mask):
+    turn = 0
+    while True:
+        playable = board.possible(mask)
+        if not playable:
+            return 0.5
+        if board.winning(current, mask) & playable:
+            return 1 - turn
+        threats = board.winning(current ^ mask, mask) & playable
+        if threats:
+            move = threats & -threats
+        else:
+            move = random.choice([playable & column for column in board.COLUMNS if playable & column])
+        current, mask = current ^ mask, mask | move
+        turn ^= 1
+
+class mcts:
+    """A computer player that plays out random games for a set time."""
+
+    def __init__(self, milliseconds=300, capacity=500000, exploration=1.4, iterations=None):
+        self.milliseconds = milliseconds
+        self.iterations = iterations
+        self.exploration = exploration
+        self.capacity = capacity
+        self.parents = array.array("i", bytes(4 * capacity))
+        self.firsts = array.array("i", bytes(4 * capacity))
+        self.counts = array.array("b", bytes(capacity))
+        self.columns = array.array("b", bytes(capacity))
+        self.states = array.array("b", bytes(capacity))
+        self.visits = array.array("I", bytes(4 * capacity))
+        self.wins = array.array("d", bytes(8 * capacity))
+        self.currents = array.array("Q", bytes(8 * capacity))
+        self.masks = array.array("Q", bytes(8 * capacity))
+        self.size = 0
+        self.root = -1
+        self.simulations = 0
+
+    def move(self, game, color):
+        """Pick a column to drop the given color's next tile into."""
+        current, mask = game.position(color)
+        self.reroot(current, mask)
+
+        # A winning move needs no thinking.
+        first, count = self.firsts[self.root], self.counts[self.root]
+        for child in range(first, first + count):
+            if self.states[child] == WON:
+                return self.columns[child]
+
+        self.simulations = 0
+        deadline = time.perf_counter() + self.milliseconds / 1000
+        while time.perf_counter() < deadline and (self.iterations is None or self.simulations < self.iterations):
+            self.iterate()
+            self.simulations += 1
+
+        best = max(range(first, first + count), key=lambda child: self.visits[child])
+        return self.columns[best]
+
+    # Make a node, or return -1 if the arrays are full.
+    def add(self, parent, column, current, mask, state):
+        if self.size == self.capacity:
+            return -1
+        node = self.size
+        self.size += 1
+        self.parents[node] = parent
+        self.firsts[node] = -1
+        self.counts[node] = 0
+        self.columns[node] = column
+        self.states[node] = state
+        self.visits[node] = 0
+        self.wins[node] = 0.0
+        self.currents[node] = current
+        self.masks[node] = mask
+        return node
+
+    # Give a node a child for every move, if there is room for them all.
+    def expand(self, node):
+        current, mask = self.currents[node], self.masks[node]
+        playable = board.possible(mask)
+        moves = [(column, playable & bits) for column, bits in enumerate(board.COLUMNS) if playable & bits]
+        if self.size + len(moves) > self.capacity:
+            return False
+        wins = board.winning(current, mask)
+        first = self.size
+        for column, move in moves:
+            state = OPEN
+            if move & wins:
+                state = WON
+            elif mask | move == board.FULL:
+                state = DRAWN
+            self.add(node, column, current ^ mask, mask | move, state)
+        self.firsts[node] = first
+        self.counts[node] = len(moves)
+        return True
+
+    # Pick the child with the best upper confidence bound.
+    def select(self, node):
+        first = self.firsts[node]
+        scale = self.exploration * math.sqrt(math.log(self.visits[node] + 1))
+        best, choice = -1.0, first
+        for child in range(first, first + self.counts[node]):
+            visits = self.visits[child]
+            if visits == 0 or self.states[child] == WON:
+                return child
+            value = self.wins[child] / visits + scale / math.sqrt(visits)
+            if value > best:
+                best, choice = value, child
+        return choice
+
+    # Run one simulation: select, expand, play out and back up.
+    def iterate(self):
+        node = self.root
+        while self.firsts[node] >= 0 and self.states[node] == OPEN:
+            node = self.select(node)
+
+        if self.states[node] == OPEN and (node == self.root or self.visits[node] > 0):
+            if self.expand(node):
+                node = self.select(node)
+
+        # Score for the player who made the move into the node.
+        state = self.states[node]
+        if state == WON:
+            score = 1.0
+        elif state == DRAWN:
+            score = 0.5
+        else:
+            score = 1.0 - playout(self.currents[node], self.masks[node])
+
+        while node >= 0:
+            self.visits[node] += 1
+            self.wins[node] += score
+            score = 1.0 - score
+            node = self.parents[node]
+
+    # Make the given position the root, keeping its subtree if the tree
+    # already has it within the last two moves.
+    def reroot(self, current, mask):
+        found = -1
+        if self.root >= 0:
+            if self.currents[self.root] == current and self.masks[self.root] == mask:
+                found = self.root
+            else:
+                first, count = self.firsts[self.root], self.counts[self.root]
+                for child in range(first, first + count):
+                    grandchild = self.firsts[child]
+                    for node in range(grandchild, grandchild + self.counts[child]):
+                        if self.currents[node] == current and self.masks[node] == mask:
+                            found = node
+
+        if found < 0:
+            self.size = 0
+            self.root = self.add(-1, -1, current, mask, OPEN)
+        else:
+            self.compact(found)
+        if self.firsts[self.root] < 0:
+            self.expand(self.root)
+
+    # Slide the subtree under a node to the front of the arrays. Nodes
+    # keep their relative order, which keeps siblings next to each other
+    # and means no node is overwritten before it is copied.
+    def compact(self, top):
+        keep = []
+        stack = [top]
+        while stack:
+            node = stack.pop()
+            keep.append(node)
+            first = self.firsts[node]
+            if first >= 0:
+                stack.extend(range(first, first + self.counts[node]))
+        keep.sort()
+        moved = {old: new for new, old in enumerate(keep)}
+
+        for new, old in enumerate(keep):
+            self.parents[new] = moved.get(self.parents[old], -1) if old != top else -1
+            self.firsts[new] = moved[self.firsts[old]] if self.firsts[old] >= 0 else -1
+            self.counts[new] = self.counts[old]
+            self.columns[new] = self.columns[old]
+            self.states[new] = self.states[old]
+            self.visits[new] = self.visits[old]
+            self.wins[new] = self.wins[old]
+            self.currents[new] = self.currents[old]
+            self.masks[new] = self.masks[old]
+        self.size = len(keep)
+        self.root = 0
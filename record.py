@@ -0,0 +1,95 @@
+#########################################################################
+# Compact game records.
+#
+# A record file starts with an 8-byte header, followed by one record
+# per game: a byte with the number of moves, a byte of flags, and the
+# columns played, two moves to a byte with the first move in the high
+# nibble. The flags hold the result in the low two bits (0 unfinished,
+# 1 red won, 2 blue won, 3 draw) and set bit 2 when blue moved first.
+# A finished game takes at most 23 bytes.
+#########################################################################
+
+import board
+
+MAGIC = b"C4GAMES\x01"
+RESULTS = (None, "red", "blue", "draw")
+BLUE_FIRST = 4
+
+# Flags byte -> (result, first color)
+FLAGS = tuple((RESULTS[flags & 3], "blue" if flags & BLUE_FIRST else "red") for flags in range(8))
+
+# Turns the hex digits of packed moves into column numbers.
+DIGITS = bytes.maketrans(b"0123456789abcdef", bytes(range(16)))
+
+# Pack one game into a record.
+def encode(moves, result=None, first="red"):
+    moves = list(moves)
+    if len(moves) > board.WIDTH * board.HEIGHT:
+        raise ValueError("A game can't have " + str(len(moves)) + " moves")
+    for column in moves:
+        if not 0 <= column < board.WIDTH:
+            raise ValueError("Invalid column: " + str(column))
+    if result not in RESULTS or first not in board.COLORS:
+        raise ValueError("Invalid result or first player: " + str((result, first)))
+
+    flags = RESULTS.index(result) | (BLUE_FIRST if first == "blue" else 0)
+    digits = "".join(map(str, moves))
+    if len(moves) % 2:
+        digits += "0"
+    return bytes((len(moves), flags)) + bytes.fromhex(digits)
+
+class writer:
+    """Appends game records to a file."""
+
+    def __init__(self, filename):
+        self.file = open(filename, "ab")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+
+    def write(self, moves, result=None, first="red"):
+        """Add one game: its columns, its result and who moved first."""
+        self.file.write(encode(moves, result, first))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *error):
+        self.close()
+
+def append(filename, moves, result=None, first="red"):
+    """Add one game to the end of a record file."""
+    with writer(filename) as games:
+        games.write(moves, result, first)
+
+def read(filename, chunk=1 << 20):
+    """Go through a record file one game at a time.
+
+    Yields (moves, result, first) for each game, where moves is a bytes
+    object of column numbers. The file is read a chunk at a time, so
+    memory use doesn't grow with the size of the file.
+    """
+    with open(filename, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("Not a game record file: " + str(filename))
+        buffer = b""
+        while True:
+            data = f.read(chunk)
+            if not data:
+                break
+            buffer += data
+            at = 0
+            end = len(buffer) - 1
+            while at < end:
+                count = buffer[at]
+                after = at + 2 + (count + 1) // 2
+                if after > len(buffer):
+                    break
+                result, first = FLAGS[buffer[at + 1] & 7]
+                yield buffer[at + 2:after].hex()[:count].encode().translate(DIGITS), result, first
+                at = after
+            buffer = buffer[at:]
+        if buffer:
+            raise ValueError("Record file ends partway through a game: " + str(filename))
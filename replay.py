@@ -0,0 +1,163 @@
+#########################################################################
+# Replaying recorded games.
+#
+# replay() rebuilds a game's final position straight from its columns
+# and outcome() works out the result the rules give it, with no window,
+# so whole record files can be checked again whenever the rules change.
+# show() plays a game back in a window with the game's own art.
+#
+# Example:  python replay.py "Game Records.c4" --show 0 --speed 200
+#########################################################################
+
+import time
+import argparse
+import board
+import record
+
+# Column number -> bottom cell of the column.
+STEPS = dict(enumerate(board.BOTTOMS))
+
+# The empty bit on top of every column, only ever set by a column that
+# has been given a seventh tile.
+TOP = board.BOTTOM << board.HEIGHT
+
+# Replays shorter than this many milliseconds a move place several
+# tiles per frame instead.
+FRAME = 16
+
+def replay(moves):
+    """Drop tiles into the given columns and return the final (current, mask)."""
+    current = mask = 0
+    steps = STEPS
+    try:
+        for column in moves:
+            current ^= mask
+            mask |= mask + steps[column]
+    except (KeyError, TypeError):
+        raise ValueError("Invalid column in " + str(list(moves)))
+    if mask & TOP:
+        raise ValueError("Too many tiles in one column: " + str(list(moves)))
+    return current, mask
+
+def outcome(moves, first="red"):
+    """Get the result the rules give a game: "red", "blue", "draw" or None.
+
+    Raises ValueError for moves no legal game could have, including any
+    played after the game was already won.
+    """
+    if not moves:
+        return None
+    current, mask = replay(moves[:-1])
+    if board.won(current) or board.won(current ^ mask):
+        raise ValueError("Moves were played after the game was won: " + str(list(moves)))
+
+    column = moves[-1]
+    if column not in STEPS:
+        raise ValueError("Invalid column in " + str(list(moves)))
+    move = (mask + STEPS[column]) & ~mask
+    if move & TOP:
+        raise ValueError("Too many tiles in one column: " + str(list(moves)))
+
+    # The player to move before the last move is the one who made it.
+    if board.won(current | move):
+        return first if len(moves) % 2 else board.other(first)
+    if mask | move == board.FULL:
+        return "draw"
+    return None
+
+def check(filename):
+    """Replay every game in a record file against its recorded result.
+
+    Returns the number of games and a list of (game number, problem)
+    for the ones that break the rules or have the wrong result.
+    """
+    games = 0
+    problems = []
+    for moves, result, first in record.read(filename):
+        try:
+            found = outcome(moves, first)
+            if found != result:
+                problems.append((games, "recorded " + str(result) + ", but the rules give " + str(found)))
+        except ValueError as error:
+            problems.append((games, str(error)))
+        games += 1
+    return games, problems
+
+def show(moves, first="red", milliseconds=300):
+    """Play a game back in a window, one move every so many milliseconds.
+
+    Returns the window once it closes, or right away when running
+    without a display.
+    """
+    import intrographics
+
+    moves = list(moves)
+    result = outcome(moves, first)
+    window = intrographics.window(850, 850)
+    window.sprites("Sprites.png")
+    window.image(0, 0, "Connect 4! Grid")
+
+    # One arrow of each color, moved into place or out of sight as needed.
+    arrows = {"red": window.image(-200, 23, "Red Arrow"), "blue": window.image(-200, 23, "Blue Arrow")}
+    tiles = {"red": "Red Tile", "blue": "Blue Tile"}
+    heights = [0] * board.WIDTH
+    played = [0]
+    interval = max(FRAME, milliseconds)
+    batch = max(1, FRAME // max(1, milliseconds))
+
+    def point(color, column):
+        for arrow in arrows.values():
+            arrow.relocate(-200, 23)
+        if color is not None:
+            arrows[color].relocate(board.x_of(column), 23)
+
+    def advance():
+        with window.batch():
+            for i in range(played[0], min(played[0] + batch, len(moves))):
+                color = first if i % 2 == 0 else board.other(first)
+                column = moves[i]
+                window.image(board.x_of(column), board.y_of(heights[column]), tiles[color])
+                heights[column] += 1
+            played[0] = min(played[0] + batch, len(moves))
+
+            if played[0] < len(moves):
+                color = first if played[0] % 2 == 0 else board.other(first)
+                point(color, moves[played[0]])
+            else:
+                window.offTimer(advance)
+                point(None, None)
+                if result is not None:
+                    window.image(0, 0, "End Board")
+                    banner = {"red": "Red Wins!", "blue": "Blue Wins!", "draw": "Tie Game!"}[result]
+                    window.image(50, 295, banner)
+
+    if moves:
+        point(first, moves[0])
+        window.onTimer(interval, advance)
+    window.open("Connect 4! Replay")
+    return window
+
+def main():
+    parser = argparse.ArgumentParser(description="Check or watch recorded Connect 4 games.")
+    parser.add_argument("filename", help="a game record file")
+    parser.add_argument("--show", type=int, default=None, help="watch this game (counting from 0) instead of checking the file")
+    parser.add_argument("--speed", type=int, default=300, help="milliseconds per move when watching a game")
+    options = parser.parse_args()
+
+    if options.show is not None:
+        for number, (moves, result, first) in enumerate(record.read(options.filename)):
+            if number == options.show:
+                show(moves, first, options.speed)
+                return 0
+        parser.error("The file has no game " + str(options.show))
+
+    start = time.perf_counter()
+    games, problems = check(options.filename)
+    elapsed = time.perf_counter() - start
+    for number, problem in problems:
+        print("Game " + str(number) + ": " + problem)
+    print("Checked " + str(games) + " games in %.2f s (%.0f games/s), %d with problems" % (elapsed, games / max(elapsed, 1e-9), len(problems)))
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,307 @@
+#########################################################################
+# A computer opponent: negamax search with alpha-beta pruning.
+#
+# The search works on raw bitboards rather than on board objects: the
+# tiles of the player to move and the mask of every tile, as built by
+# board.board.position(). Scores are from the point of view of the
+# player to move, and a win is worth more the sooner it comes.
+#########################################################################
+
+import time
+import array
+import board
+
+CELLS = board.WIDTH * board.HEIGHT
+WIN = 1000
+INFINITY = 2 * WIN
+
+# Kinds of score a table entry can hold.
+EXACT = 1
+LOWER = 2
+UPPER = 3
+NONE = 7  # No best move
+
+# Stop searching when the time budget runs out.
+class timeout(Exception):
+    pass
+
+# Count the tiles on a bitboard.
+def count(bits):
+    return bin(bits).count("1")
+
+# Guess how good a position is for the player to move.
+def estimate(current, mask):
+    opponent = current ^ mask
+    score = 2 * (count(board.winning(current, mask)) - count(board.winning(opponent, mask)))
+    score += count(current & board.COLUMNS[3]) - count(opponent & board.COLUMNS[3])
+    return score
+
+class table:
+    """Search results by position hash, in a fixed amount of memory.
+
+    Entries live in parallel arrays indexed by the low bits of the hash.
+    A new result takes a slot only if the slot is empty, holds the same
+    position, was filled during an earlier search, or was searched no
+    deeper than the new result.
+    """
+
+    # Bytes per entry: hash, score, depth, kind and move, search number.
+    ENTRY = 8 + 2 + 1 + 1 + 1
+
+    def __init__(self, memory=16 * 1024 * 1024):
+        size = 1
+        while 2 * size * table.ENTRY <= memory:
+            size *= 2
+        self.size = size
+        self.keys = array.array("Q", bytes(8 * size))
+        self.scores = array.array("h", bytes(2 * size))
+        self.depths = array.array("b", bytes(size))
+        self.kinds = array.array("B", bytes(size))
+        self.ages = array.array("B", bytes(size))
+        self.age = 1
+
+    # Start a new search, so older entries give way to new ones.
+    def renew(self):
+        self.age = self.age % 255 + 1
+
+    def clear(self):
+        self.keys = array.array("Q", bytes(8 * self.size))
+        self.kinds = array.array("B", bytes(self.size))
+        self.age = 1
+
+    # Get (depth, kind, score, move) for a position, or None.
+    def probe(self, key):
+        slot = key & (self.size - 1)
+        if self.kinds[slot] and self.keys[slot] == key:
+            kind = self.kinds[slot]
+            return self.depths[slot], kind & 3, self.scores[slot], kind >> 2
+        return None
+
+    def store(self, key, depth, kind, score, move):
+        slot = key & (self.size - 1)
+        if not self.kinds[slot] or self.keys[slot] == key or self.ages[slot] != self.age or depth >= self.depths[slot]:
+            self.keys[slot] = key
+            self.scores[slot] = score
+            self.depths[slot] = depth
+            self.kinds[slot] = kind | move << 2
+            self.ages[slot] = self.age
+
+class negamax:
+    """A computer player that searches deeper until it runs out of time.
+
+    Each pass searches one move deeper than the last, trying the best
+    move found so far first. Inside the search, the transposition table's
+    best move comes first and center columns come before edge columns.
+    Moves can also be sorted by the new threats they make, then by killer
+    moves (ones that caused cutoffs at the same depth), then by history
+    (how often a move caused cutoffs before). Those cut the number of
+    nodes but cost more time per node than they save here, so they are
+    off unless asked for; python search.py compares them.
+    progress lists (depth, nodes, seconds) for each finished pass.
+    """
+
+    def __init__(self, depth=8, milliseconds=None, memory=16 * 1024 * 1024, book=None,
+                 threats=False, killers=False, history=False):
+        self.depth = depth
+        self.milliseconds = milliseconds
+        self.table = table(memory)
+        self.book = book
+        self.ordering = (threats, killers, history)
+        self.killers = [[NONE, NONE] for moves in range(CELLS + 1)]
+        self.history = [[0] * (board.WIDTH * board.H1) for side in range(2)]
+        self.deadline = None
+        self.progress = []
+        self.nodes = 0
+        self.score = 0
+
+    def move(self, game, color):
+        """Pick a column to drop the given color's next tile into."""
+        current, mask = game.position(color)
+        return self.best(current, mask, game.count, game.hash)
+
+    # Search every move from a position and return the best column.
+    def best(self, current, mask, moves, key=0):
+        self.nodes = 0
+        self.progress = []
+        if self.book is not None:
+            entry = self.book.lookup(current, mask)
+            if entry is not None:
+                self.score, column = entry
+                return column
+
+        start = time.perf_counter()
+        self.table.renew()
+        self.deadline = None
+        if self.milliseconds is not None:
+            self.deadline = start + self.milliseconds / 1000
+
+        playable = board.possible(mask)
+        wins = board.winning(current, mask) & playable
+        choice = None
+        for column in board.ORDER:
+            if wins & board.COLUMNS[column]:
+                self.score = WIN + CELLS - moves
+                return column
+            if choice is None and playable & board.COLUMNS[column]:
+                choice = column
+
+        # Old cutoffs count for less in a new position.
+        self.killers = [[NONE, NONE] for moves in range(CELLS + 1)]
+        for side in self.history:
+            for i in range(len(side)):
+                side[i] >>= 1
+
+        # Keep the answer from the deepest pass that finished in time.
+        try:
+            for depth in range(1, min(self.depth, CELLS - moves) + 1):
+                alpha, found = -INFINITY, choice
+                for column in (choice,) + tuple(c for c in board.ORDER if c != choice):
+                    move = playable & board.COLUMNS[column]
+                    if move:
+                        child = key ^ board.ZOBRIST[moves & 1][move.bit_length() - 1]
+                        score = -self.search(current ^ mask, mask | move, moves + 1, child, depth - 1, -INFINITY, -alpha)
+                        if score > alpha:
+                            alpha, found = score, column
+                choice, self.score = found, alpha
+                self.progress.append((depth, self.nodes, time.perf_counter() - start))
+                if abs(alpha) >= WIN:
+                    break  # Nothing deeper can change a forced result
+        except timeout:
+            pass
+        return choice
+
+    # Order the playable columns for searching, best guesses first.
+    def order(self, current, mask, playable, moves, column):
+        columns = [c for c in board.ORDER if playable & board.COLUMNS[c]]
+        threats, killers, history = self.ordering
+        if threats or killers or history:
+            killer = self.killers[moves] if killers else ()
+            scores = self.history[moves & 1]
+
+            def rank(c):
+                move = playable & board.COLUMNS[c]
+                made = count(board.winning(current | move, mask | move)) if threats else 0
+                return -made, c not in killer, -scores[move.bit_length() - 1] if history else 0
+
+            columns.sort(key=rank)
+        if column in columns:
+            columns.remove(column)
+            columns.insert(0, column)
+        return columns
+
+    # Remember a move that caused a cutoff.
+    def cutoff(self, playable, moves, column, depth):
+        threats, killers, history = self.ordering
+        if killers:
+            killer = self.killers[moves]
+            if killer[0] != column:
+                killer[1] = killer[0]
+                killer[0] = column
+        if history:
+            self.history[moves & 1][(playable & board.COLUMNS[column]).bit_length() - 1] += depth * depth
+
+    # Score a position for the player to move.
+    def search(self, current, mask, moves, key, depth, alpha, beta):
+        self.nodes += 1
+        if self.deadline is not None and self.nodes & 1023 == 0 and time.perf_counter() > self.deadline:
+            raise timeout
+
+        if moves == CELLS:
+            return 0
+
+        playable = board.possible(mask)
+        if board.winning(current, mask) & playable:
+            return WIN + CELLS - moves
+
+        # Block the opponent's threats, and never play right under one.
+        opponent = current ^ mask
+        threats = board.winning(opponent, mask)
+        forced = playable & threats
+        if forced:
+            if forced & (forced - 1):
+                return -(WIN + CELLS - moves - 1)
+            playable = forced
+        playable &= ~(threats >> 1)
+        if not playable:
+            return -(WIN + CELLS - moves - 1)
+
+        if depth <= 0:
+            return estimate(current, mask)
+
+        # Reuse what an earlier visit to this position found.
+        column = NONE
+        entry = self.table.probe(key)
+        if entry is not None:
+            stored, kind, score, column = entry
+            if stored >= depth:
+                if kind == EXACT:
+                    return score
+                if kind == LOWER and score > alpha:
+                    alpha = score
+                elif kind == UPPER and score < beta:
+                    beta = score
+                if alpha >= beta:
+                    return score
+
+        start = alpha
+        best, choice = -INFINITY, NONE
+        zobrist = board.ZOBRIST[moves & 1]
+        for column in self.order(current, mask, playable, moves, column):
+            move = playable & board.COLUMNS[column]
+            score = -self.search(opponent, mask | move, moves + 1, key ^ zobrist[move.bit_length() - 1], depth - 1, -beta, -alpha)
+            if score > best:
+                best, choice = score, column
+            if score >= beta:
+                self.table.store(key, depth, LOWER, score, column)
+                self.cutoff(playable, moves, column, depth)
+                return score
+            if score > alpha:
+                alpha = score
+
+        self.table.store(key, depth, EXACT if best > start else UPPER, best, choice)
+        return best
+
+# Build a position from columns numbered 1 to 7, as in "4453".
+def position(sequence):
+    game = board.board()
+    for i, column in enumerate(sequence):
+        game.drop(board.COLORS[i % 2], int(column) - 1)
+    return game
+
+# Positions for comparing searches, none of them won yet.
+POSITIONS = ("", "4444", "43444", "3454", "445", "444333", "5444", "3334445556")
+
+# Move orderings to compare: (name, threats, killers, history).
+ORDERINGS = (
+    ("center", False, False, False),
+    ("killers+history", False, True, True),
+    ("threats", True, False, False),
+    ("threats+killers+history", True, True, True),
+)
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Show how move ordering cuts down the search.")
+    parser.add_argument("--depth", type=int, default=10, help="depth to search each position to")
+    options = parser.parse_args()
+
+    totals = {}
+    for sequence in POSITIONS:
+        game = position(sequence)
+        color = board.COLORS[game.count % 2]
+        print('"' + sequence + '"')
+        for name, threats, killers, history in ORDERINGS:
+            player = negamax(depth=options.depth, threats=threats, killers=killers, history=history)
+            player.move(game, color)
+            seconds = player.progress[-1][2] if player.progress else 0.0
+            nodes, total = totals.get(name, (0, 0.0))
+            totals[name] = (nodes + player.nodes, total + seconds)
+            print("  %-24s" % name + "  ".join("d%d %d nodes %.0f ms" % (depth, nodes, 1000 * seconds)
+                                                for depth, nodes, seconds in player.progress[-3:]))
+    print("Totals")
+    for name, threats, killers, history in ORDERINGS:
+        nodes, seconds = totals[name]
+        print("  %-24s%d nodes %.0f ms" % (name, nodes, 1000 * seconds))
+
+if __name__ == "__main__":
+    main()
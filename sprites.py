@@ -0,0 +1,80 @@
+#########################################################################
+# Sprite sheets: the game's pictures packed into one PNG.
+#
+# The sheet keeps its index in a text chunk named "sprites": a JSON
+# object mapping each picture's name to its x, y, width and height on
+# the sheet. Names are the original file names without ".gif".
+# window.sprites() reads a sheet, and window.image() then draws its
+# pictures by name.
+#
+# Rebuild the game's sheet after changing its art with:  python sprites.py
+#########################################################################
+
+import os
+import json
+import argparse
+import headless
+
+KEYWORD = "sprites"
+
+ART = ("Connect 4! Grid.gif", "End Board.gif", "Red Wins!.gif", "Blue Wins!.gif", "Tie Game!.gif",
+       "Red Tile.gif", "Blue Tile.gif", "Red Arrow.gif", "Blue Arrow.gif")
+
+# Place pictures on shelves, tallest first, each shelf as tall as its
+# first picture. Returns {name: (x, y)} and the sheet's height.
+def pack(sizes, width):
+    places = {}
+    x = y = shelf = 0
+    for name in sorted(sizes, key=lambda name: (-sizes[name][1], name)):
+        w, h = sizes[name]
+        if x + w > width:
+            x, y, shelf = 0, y + shelf, 0
+        places[name] = (x, y)
+        x += w
+        shelf = max(shelf, h)
+    return places, y + shelf
+
+def build(filenames, output, width=None):
+    """Pack GIF files into one PNG sprite sheet and return its index."""
+    pictures = {}
+    for filename in filenames:
+        with open(filename, "rb") as f:
+            data = f.read()
+        size = (data[6] | data[7] << 8, data[8] | data[9] << 8)
+        mask = bytearray(size[0] * size[1])
+        pixels = headless.gif.decode(data, size, mask)
+        pictures[os.path.splitext(os.path.basename(filename))[0]] = (size, pixels, mask)
+
+    sizes = {name: picture[0] for name, picture in pictures.items()}
+    if width is None:
+        width = 2 * max(w for w, h in sizes.values())
+    places, height = pack(sizes, width)
+
+    sheet = bytearray(4 * width * height)
+    index = {}
+    for name, ((w, h), pixels, mask) in pictures.items():
+        x, y = places[name]
+        index[name] = [x, y, w, h]
+        for row in range(h):
+            rgba = bytearray(4 * w)
+            for i in range(3):
+                rgba[i::4] = pixels[3 * w * row + i:3 * w * (row + 1):3]
+            rgba[3::4] = mask[w * row:w * (row + 1)]
+            at = 4 * ((y + row) * width + x)
+            sheet[at:at + 4 * w] = rgba
+
+    with open(output, "wb") as f:
+        f.write(headless.png.encode(sheet, (width, height), {KEYWORD: json.dumps(index, sort_keys=True)}))
+    return index
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack GIF pictures into one PNG sprite sheet.")
+    parser.add_argument("files", nargs="*", default=list(ART), help="GIF files to pack (default: the game's art)")
+    parser.add_argument("--output", default="Sprites.png", help="file to write")
+    options = parser.parse_args()
+
+    index = build(options.files, options.output)
+    print("Wrote " + str(len(index)) + " sprites to " + options.output)
+
+if __name__ == "__main__":
+    main()
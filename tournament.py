@@ -0,0 +1,141 @@
+#########################################################################
+# Self-play tournaments between computer players.
+#
+# Games are played on board.board with the same rules as the window:
+# tiles drop to the lowest open row, four in a row wins, and a full
+# board of 42 tiles is a tie. Players take turns playing red, and the
+# games are spread over a pool of worker processes.
+#
+# Example:  python tournament.py negamax:8 random --games 200
+#########################################################################
+
+import time
+import random
+import argparse
+import multiprocessing
+import board
+import search
+import mcts
+
+class randomplayer:
+    """A player that drops tiles into random open columns."""
+
+    def move(self, game, color):
+        """Pick a column to drop the given color's next tile into."""
+        return random.choice([column for column in range(board.WIDTH) if game.playable(column)])
+
+# Make a player from a description like "random", "negamax:8" (depth),
+# "negamax:12:100" (depth and milliseconds per move) or "mcts:100"
+# (milliseconds per move).
+def player(description):
+    parts = description.split(":")
+    if parts[0] == "random" and len(parts) == 1:
+        return randomplayer()
+    if parts[0] == "negamax" and len(parts) <= 3:
+        depth = int(parts[1]) if len(parts) > 1 else 8
+        milliseconds = int(parts[2]) if len(parts) > 2 else None
+        return search.negamax(depth=depth, milliseconds=milliseconds)
+    if parts[0] == "mcts" and len(parts) <= 2:
+        milliseconds = int(parts[1]) if len(parts) > 1 else 300
+        return mcts.mcts(milliseconds=milliseconds)
+    raise ValueError("Unknown player: " + description)
+
+# Play one game and return the winner (0, 1 or None for a tie) with each
+# player's time per move in seconds.
+def play(first, second):
+    game = board.board()
+    players = (first, second)
+    times = ([], [])
+    turn = 0
+    while True:
+        color = board.COLORS[turn]
+        start = time.perf_counter()
+        column = players[turn].move(game, color)
+        times[turn].append(time.perf_counter() - start)
+        if not game.playable(column):
+            return 1 - turn, times  # An illegal move forfeits the game
+        row = game.drop(color, column)
+        if game.connects(color, column, row):
+            return turn, times
+        if game.full():
+            return None, times
+        turn = 1 - turn
+
+# Players made once per worker process.
+players = None
+seed = 0
+
+def setup(descriptions, base):
+    global players, seed
+    players = [player(description) for description in descriptions]
+    seed = base
+
+# Play game number i in a worker. Players swap colors every game.
+def match(i):
+    random.seed(seed + i)
+    if i % 2 == 0:
+        winner, times = play(players[0], players[1])
+    else:
+        winner, times = play(players[1], players[0])
+        times = (times[1], times[0])
+        if winner is not None:
+            winner = 1 - winner
+    return winner, times
+
+# Get a percentile of a sorted list.
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def run(descriptions, games, processes=None, base=0):
+    """Play a tournament and return its results as a dictionary."""
+    start = time.perf_counter()
+    wins = [0, 0]
+    draws = 0
+    times = ([], [])
+    with multiprocessing.Pool(processes, setup, (descriptions, base)) as pool:
+        for winner, moves in pool.imap_unordered(match, range(games), chunksize=max(1, games // (8 * (processes or multiprocessing.cpu_count())))):
+            if winner is None:
+                draws += 1
+            else:
+                wins[winner] += 1
+            times[0].extend(moves[0])
+            times[1].extend(moves[1])
+    elapsed = time.perf_counter() - start
+
+    results = {"games": games, "seconds": elapsed, "games per second": games / elapsed, "draws": draws / games, "players": []}
+    for i, description in enumerate(descriptions):
+        latencies = sorted(times[i])
+        results["players"].append({
+            "player": description,
+            "wins": wins[i] / games,
+            "moves": len(latencies),
+            "p50 ms": 1000 * percentile(latencies, 0.50),
+            "p90 ms": 1000 * percentile(latencies, 0.90),
+            "p99 ms": 1000 * percentile(latencies, 0.99),
+            "max ms": 1000 * (latencies[-1] if latencies else 0.0),
+        })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Play Connect 4 games between computer players.")
+    parser.add_argument("first", help='a player: "random", "negamax:DEPTH", "negamax:DEPTH:MILLISECONDS" or "mcts:MILLISECONDS"')
+    parser.add_argument("second", help="the other player")
+    parser.add_argument("--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the first game")
+    options = parser.parse_args()
+
+    descriptions = (options.first, options.second)
+    for description in descriptions:
+        player(description)  # Fail early on a bad description
+
+    results = run(descriptions, options.games, options.processes, options.seed)
+    print(str(results["games"]) + " games in %.2f s (%.1f games/s), %.1f%% draws" % (results["seconds"], results["games per second"], 100 * results["draws"]))
+    for entry in results["players"]:
+        print("%-20s wins %5.1f%%   move latency p50 %.2f ms, p90 %.2f ms, p99 %.2f ms, max %.2f ms" % (
+            entry["player"], 100 * entry["wins"], entry["p50 ms"], entry["p90 ms"], entry["p99 ms"], entry["max ms"]))
+
+if __name__ == "__main__":
+    main()